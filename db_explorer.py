@@ -4,13 +4,66 @@ EliseAI Database Explorer
 Analyzes the structure and content of eliseai_analysis.db
 """
 
+import argparse
+import re
 import sqlite3
-import pandas as pd
+import sys
+from collections import defaultdict
+from contextlib import closing
 from pathlib import Path
 
-def explore_database(db_path="eliseai_analysis.db"):
+# Declared-type and column-name rules for numeric and date/time statistics
+NUMERIC_TYPE_RX = re.compile(r'INT|REAL|FLOAT|NUMERIC|DECIMAL')
+DATE_TYPE_RX = re.compile(r'DATE|TIME')
+DATE_NAME_RX = re.compile(r'date|time|created|updated')
+
+# Column name categories for the pattern report, in priority order
+COLUMN_PATTERNS = [
+    ('IDs', ['id']),
+    ('Dates/Times', ['date', 'time']),
+    ('Names/Titles', ['name', 'title']),
+    ('Agent/User', ['agent', 'user']),
+    ('Property/Location', ['property', 'location']),
+]
+
+# One alternation over every token, wrapped in a lookahead so overlapping hits
+# are all reported; group p<i> identifies the COLUMN_PATTERNS entry that matched
+COLUMN_PATTERN_RX = re.compile('(?=(?:' + '|'.join(
+    f"(?P<p{i}>{'|'.join(tokens)})" for i, (_, tokens) in enumerate(COLUMN_PATTERNS)
+) + '))')
+
+
+def classify_column(col_name):
+    """Return the highest-priority pattern category matching a column name, or None."""
+    hits = {int(m.lastgroup[1:]) for m in COLUMN_PATTERN_RX.finditer(col_name.lower())}
+    return COLUMN_PATTERNS[min(hits)][0] if hits else None
+
+def format_rows(col_names, rows):
+    """Render query rows as a right-aligned text table (like DataFrame.to_string)."""
+    cells = [[str(v) for v in row] for row in rows]
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(col_names)]
+    lines = [" ".join(f"{name:>{w}}" for name, w in zip(col_names, widths))]
+    for row in cells:
+        lines.append(" ".join(f"{v:>{w}}" for v, w in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def tune_connection(conn):
+    """
+    Apply read-side SQLite tuning: a 256 MB page cache, memory-mapped I/O and
+    in-memory temp storage. The WAL journal mode is persistent and is set when
+    setup_database creates the file, so the explorer never needs to write.
+    """
+    conn.execute("PRAGMA cache_size=-262144;")
+    conn.execute("PRAGMA mmap_size=268435456;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+
+def explore_database(db_path="eliseai_analysis.db", sample=True, stats=True):
     """
     Comprehensive exploration of the EliseAI database
+
+    Set `sample=False` to skip the sample-row query and `stats=False` to skip
+    the per-column aggregates (only the row count is fetched).
     """
     
     # Check if database exists
@@ -22,155 +75,143 @@ def explore_database(db_path="eliseai_analysis.db"):
     print("=" * 60)
     
     try:
-        # Connect to database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        # Connect to database; closing() releases the connection and cursor on every exit path
+        with closing(sqlite3.connect(db_path)) as conn, closing(conn.cursor()) as cursor:
+            tune_connection(conn)
         
-        # 1. Get all table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
+            # 1. Get all table names
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+            tables = cursor.fetchall()
         
-        if not tables:
-            print("❌ No tables found in database!")
-            return
+            if not tables:
+                print("❌ No tables found in database!")
+                return
         
-        print(f"📊 Found {len(tables)} tables:")
-        table_names = [table[0] for table in tables]
-        for i, table_name in enumerate(table_names, 1):
-            print(f"  {i}. {table_name}")
+            print(f"📊 Found {len(tables)} tables:")
+            table_names = [table[0] for table in tables]
+            for i, table_name in enumerate(table_names, 1):
+                print(f"  {i}. {table_name}")
         
-        print("\n" + "=" * 60)
+            # Read every table's schema once; the analysis and pattern passes reuse it
+            schema_cache = {
+                table_name: cursor.execute(f"PRAGMA table_info([{table_name}]);").fetchall()
+                for table_name in table_names
+            }
         
-        # 2. Analyze each table
-        for table_name in table_names:
-            print(f"\n🔍 TABLE: {table_name}")
-            print("-" * 40)
-            
-            # Get table schema
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
+            print("\n" + "=" * 60)
+        
+            # 2. Analyze each table; each table's report is buffered and written in one call
+            for table_name in table_names:
+                lines = [f"\n🔍 TABLE: {table_name}", "-" * 40]
             
-            print("📋 Schema:")
-            for col in columns:
-                col_id, name, data_type, not_null, default, pk = col
-                pk_marker = " (PRIMARY KEY)" if pk else ""
-                null_marker = " NOT NULL" if not_null else ""
-                default_marker = f" DEFAULT {default}" if default else ""
-                print(f"  • {name}: {data_type}{pk_marker}{null_marker}{default_marker}")
+                # Get table schema
+                columns = schema_cache[table_name]
             
-            # Get row count
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
-            row_count = cursor.fetchone()[0]
-            print(f"\n📈 Row count: {row_count}")
+                lines.append("📋 Schema:")
+                for col in columns:
+                    col_id, name, data_type, not_null, default, pk = col
+                    pk_marker = " (PRIMARY KEY)" if pk else ""
+                    null_marker = " NOT NULL" if not_null else ""
+                    default_marker = f" DEFAULT {default}" if default else ""
+                    lines.append(f"  • {name}: {data_type}{pk_marker}{null_marker}{default_marker}")
             
-            if row_count > 0:
-                # Get sample data
-                print(f"\n📝 Sample data (first 5 rows):")
-                df = pd.read_sql_query(f"SELECT * FROM [{table_name}] LIMIT 5", conn)
-                print(df.to_string(index=False))
-                
-                # Get column statistics for numeric columns
+                # Classify numeric and date/time columns up front so their
+                # aggregates can be fetched alongside the row count
                 numeric_cols = []
-                for col in columns:
+                date_cols = []
+                for col in columns if stats else ():
                     col_name = col[1]
                     col_type = col[2].upper()
-                    if any(t in col_type for t in ['INT', 'REAL', 'FLOAT', 'NUMERIC', 'DECIMAL']):
+                    if NUMERIC_TYPE_RX.search(col_type):
                         numeric_cols.append(col_name)
+                    if DATE_TYPE_RX.search(col_type) or DATE_NAME_RX.search(col_name.lower()):
+                        date_cols.append(col_name)
                 
-                if numeric_cols:
-                    print(f"\n📊 Numeric column statistics:")
-                    for col in numeric_cols:
-                        try:
-                            cursor.execute(f"""
-                                SELECT 
-                                    MIN([{col}]) as min_val,
-                                    MAX([{col}]) as max_val,
-                                    AVG([{col}]) as avg_val,
-                                    COUNT(DISTINCT [{col}]) as unique_count
-                                FROM [{table_name}]
-                                WHERE [{col}] IS NOT NULL
-                            """)
-                            stats = cursor.fetchone()
-                            if stats and stats[0] is not None:
-                                print(f"  • {col}: min={stats[0]:.2f}, max={stats[1]:.2f}, avg={stats[2]:.2f}, unique={stats[3]}")
-                        except sqlite3.Error as e:
-                            print(f"  • {col}: Error analyzing - {e}")
+                # Get row count plus every column aggregate in a single round-trip
+                select_items = ["COUNT(*)"]
+                for col in numeric_cols:
+                    select_items += [f"MIN([{col}])", f"MAX([{col}])", f"AVG([{col}])", f"COUNT(DISTINCT [{col}])"]
+                for col in date_cols:
+                    select_items += [f"MIN([{col}])", f"MAX([{col}])", f"COUNT(DISTINCT [{col}])"]
+            
+                try:
+                    cursor.execute(f"SELECT {', '.join(select_items)} FROM [{table_name}];")
+                    table_stats = cursor.fetchone()
+                except sqlite3.Error as e:
+                    lines += [f"\n❌ Error analyzing {table_name}: {e}", "\n" + "-" * 40]
+                    sys.stdout.write("\n".join(lines) + "\n")
+                    continue
+            
+                row_count = table_stats[0]
+                lines.append(f"\n📈 Row count: {row_count}")
+            
+                if row_count > 0:
+                    # Get sample data
+                    if sample:
+                        lines.append(f"\n📝 Sample data (first 5 rows):")
+                        cursor.execute(f"SELECT * FROM [{table_name}] LIMIT 5")
+                        col_names = [d[0] for d in cursor.description]
+                        lines.append(format_rows(col_names, cursor.fetchmany(5)))
                 
-                # Check for date/time columns
-                date_cols = []
-                for col in columns:
-                    col_name = col[1]
-                    col_type = col[2].upper()
-                    if any(t in col_type for t in ['DATE', 'TIME', 'TIMESTAMP']) or any(t in col_name.lower() for t in ['date', 'time', 'timestamp', 'created', 'updated']):
-                        date_cols.append(col_name)
+                    # Aggregates follow COUNT(*) in the order they were selected
+                    pos = 1
+                
+                    # Get column statistics for numeric columns
+                    if numeric_cols:
+                        lines.append(f"\n📊 Numeric column statistics:")
+                        for col in numeric_cols:
+                            col_stats = table_stats[pos:pos + 4]
+                            pos += 4
+                            if col_stats[0] is not None:
+                                lines.append(f"  • {col}: min={col_stats[0]:.2f}, max={col_stats[1]:.2f}, avg={col_stats[2]:.2f}, unique={col_stats[3]}")
                 
-                if date_cols:
-                    print(f"\n📅 Date/Time column ranges:")
-                    for col in date_cols:
-                        try:
-                            cursor.execute(f"""
-                                SELECT 
-                                    MIN([{col}]) as earliest,
-                                    MAX([{col}]) as latest,
-                                    COUNT(DISTINCT [{col}]) as unique_dates
-                                FROM [{table_name}]
-                                WHERE [{col}] IS NOT NULL
-                            """)
-                            stats = cursor.fetchone()
-                            if stats and stats[0] is not None:
-                                print(f"  • {col}: {stats[0]} to {stats[1]} ({stats[2]} unique)")
-                        except sqlite3.Error as e:
-                            print(f"  • {col}: Error analyzing - {e}")
+                    # Check for date/time columns
+                    if date_cols:
+                        lines.append(f"\n📅 Date/Time column ranges:")
+                        for col in date_cols:
+                            col_stats = table_stats[pos:pos + 3]
+                            pos += 3
+                            if col_stats[0] is not None:
+                                lines.append(f"  • {col}: {col_stats[0]} to {col_stats[1]} ({col_stats[2]} unique)")
             
-            print("\n" + "-" * 40)
+                lines.append("\n" + "-" * 40)
+                sys.stdout.write("\n".join(lines) + "\n")
         
-        # 3. Look for relationships between tables
-        print(f"\n🔗 FOREIGN KEY RELATIONSHIPS:")
-        print("-" * 40)
-        
-        for table_name in table_names:
-            cursor.execute(f"PRAGMA foreign_key_list({table_name});")
-            fks = cursor.fetchall()
-            if fks:
-                print(f"\n{table_name}:")
-                for fk in fks:
-                    print(f"  • {fk[3]} → {fk[2]}.{fk[4]}")
+            # 3. Look for relationships between tables
+            print(f"\n🔗 FOREIGN KEY RELATIONSHIPS:")
+            print("-" * 40)
         
-        # 4. Look for common patterns in column names
-        print(f"\n🏷️  COMMON COLUMN PATTERNS:")
-        print("-" * 40)
+            for table_name in table_names:
+                cursor.execute(f"PRAGMA foreign_key_list({table_name});")
+                fks = cursor.fetchall()
+                if fks:
+                    print(f"\n{table_name}:")
+                    for fk in fks:
+                        print(f"  • {fk[3]} → {fk[2]}.{fk[4]}")
         
-        all_columns = []
-        for table_name in table_names:
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            for col in columns:
-                all_columns.append((table_name, col[1]))
+            # 4. Look for common patterns in column names
+            print(f"\n🏷️  COMMON COLUMN PATTERNS:")
+            print("-" * 40)
         
-        # Group by column name patterns
-        patterns = {}
-        for table, col in all_columns:
-            col_lower = col.lower()
-            if 'id' in col_lower:
-                patterns.setdefault('IDs', []).append(f"{table}.{col}")
-            elif any(t in col_lower for t in ['date', 'time', 'timestamp']):
-                patterns.setdefault('Dates/Times', []).append(f"{table}.{col}")
-            elif any(t in col_lower for t in ['name', 'title']):
-                patterns.setdefault('Names/Titles', []).append(f"{table}.{col}")
-            elif any(t in col_lower for t in ['agent', 'user']):
-                patterns.setdefault('Agent/User', []).append(f"{table}.{col}")
-            elif any(t in col_lower for t in ['property', 'location']):
-                patterns.setdefault('Property/Location', []).append(f"{table}.{col}")
+            all_columns = []
+            for table_name in table_names:
+                for col in schema_cache[table_name]:
+                    all_columns.append((table_name, col[1]))
         
-        for pattern, cols in patterns.items():
-            if len(cols) > 1:  # Only show patterns with multiple columns
-                print(f"\n{pattern}:")
-                for col in cols[:10]:  # Limit to first 10
-                    print(f"  • {col}")
-                if len(cols) > 10:
-                    print(f"  ... and {len(cols) - 10} more")
+            # Group by column name patterns (highest-priority category wins)
+            patterns = defaultdict(list)
+            for table, col in all_columns:
+                pattern = classify_column(col)
+                if pattern:
+                    patterns[pattern].append(f"{table}.{col}")
         
-        conn.close()
+            for pattern, cols in patterns.items():
+                if len(cols) > 1:  # Only show patterns with multiple columns
+                    print(f"\n{pattern}:")
+                    for col in cols[:10]:  # Limit to first 10
+                        print(f"  • {col}")
+                    if len(cols) > 10:
+                        print(f"  ... and {len(cols) - 10} more")
         
         print(f"\n✅ Database exploration complete!")
         print(f"💡 Ready to create metrics.py based on this structure")
@@ -181,4 +222,9 @@ def explore_database(db_path="eliseai_analysis.db"):
         print(f"❌ Unexpected error: {e}")
 
 if __name__ == "__main__":
-    explore_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Explore the structure and content of the EliseAI database")
+    parser.add_argument('db_path', nargs='?', default="eliseai_analysis.db", help="SQLite database to explore")
+    parser.add_argument('--no-sample', action='store_true', help="skip the 5-row sample of each table")
+    parser.add_argument('--no-stats', action='store_true', help="skip numeric and date/time column statistics")
+    args = parser.parse_args()
+    explore_database(args.db_path, sample=not args.no_sample, stats=not args.no_stats)
\ No newline at end of file
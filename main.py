@@ -7,9 +7,10 @@ Enhanced with agent-level shift metrics, travel trip analysis, and agent special
 
 import sys
 import os
+import io
+import sqlite3
 from datetime import datetime
 import pandas as pd
-pd.set_option('display.float_format', '{:,.2f}'.format)
 
 # Add src directory to path
 sys.path.append('src')
@@ -17,8 +18,8 @@ sys.path.append('src')
 try:
     from data_loading import load_excel_data, setup_database
     from travel_analysis import (
-        geocode_properties,
-        create_distance_matrix,
+        load_or_geocode_properties,
+        load_or_create_distance_matrix,
         analyze_agent_travel,
         calculate_agent_shift_metrics,
         print_agent_shift_analysis
@@ -27,18 +28,11 @@ try:
         insertion_optimization_estimate as optimization_estimate,
         export_optimization_results
     )
-    from agent_specialization import (
-        calculate_agent_specialization_metrics,
-        analyze_property_coverage,
-        compare_specialization_before_after,
-        export_specialization_analysis,
-        create_specialization_summary_report
-    )
+    from agent_specialization import compare_specialization_before_after
     from lateness_analysis import (
+        compute_travel_transitions,
         analyze_agent_lateness_risk,
-        analyze_schedule_conflicts,
-        create_lateness_visualizations,
-        export_lateness_analysis
+        analyze_schedule_conflicts
     )
     print("✅ All modules imported successfully")
 except ImportError as e:
@@ -51,26 +45,35 @@ def create_optimized_schedule(original_events, optimization_results):
     Create the optimized event schedule based on optimization results.
     This applies the agent reassignments to create the "after" scenario.
     """
-    optimized_events = original_events.copy()
+    # Share every unchanged column with the original frame; only the agent
+    # column is rewritten, into its own copy of the underlying array
+    optimized_events = original_events.copy(deep=False)
+    agents = original_events['Leasing Agent ID'].to_numpy(copy=True)
     
-    # Apply daily optimizations
+    # Flatten every daily assignment into (tour, agent) pairs
+    tour_ids = []
+    new_agents = []
     for daily_result in optimization_results['daily_results']:
-        date = daily_result['date']
-        assignments = daily_result['assignments']
-        
-        # Apply each assignment
-        for assignment in assignments:
-            tour_id = assignment['tour_id']
-            new_agent = assignment['assigned_agent']
-            
-            # Update the agent assignment for this tour
-            optimized_events.at[tour_id, 'Leasing Agent ID'] = new_agent
+        for assignment in daily_result['assignments']:
+            tour_ids.append(assignment['tour_id'])
+            new_agents.append(assignment['assigned_agent'])
+    
+    # Resolve tour labels to row positions once and scatter the new agents in
+    if tour_ids:
+        positions = original_events.index.get_indexer(tour_ids)
+        if (positions < 0).any():
+            raise KeyError(f"Unknown tour IDs in assignments: {[t for t, p in zip(tour_ids, positions) if p < 0]}")
+        agents[positions] = new_agents
+    optimized_events['Leasing Agent ID'] = agents
     
     return optimized_events
 
 
 def main():
     """Run complete travel analysis and optimization with specialization metrics on full dataset"""
+    # Set display formatting when the analysis runs rather than at import time
+    pd.set_option('display.float_format', '{:,.2f}'.format)
+
     print("🚀 ELISEAI AGENT-LEVEL CALENDAR ANALYSIS WITH SPECIALIZATION METRICS")
     print("=" * 80)
     print("Complete analysis with insertion heuristic estimation")
@@ -88,39 +91,52 @@ def main():
     print(f"   👥 Agents: {len(agent_mapping)}")
     print(f"   🏢 Properties: {len(property_mapping)}")
 
-    # Tour type distribution
-    tour_types = event_log['Tour Type'].value_counts()
+    # Step 2: Setup Database
+    print(f"\n🗄️ Setting up database...")
+    # Remove the previous database along with any WAL side files it left behind
+    for db_file in ('eliseai_analysis.db', 'eliseai_analysis.db-wal', 'eliseai_analysis.db-shm'):
+        if os.path.exists(db_file):
+            os.remove(db_file)
+    setup_database(event_log, agent_mapping, property_mapping)
+    print(f"✅ Database created with all views")
+
+    # Tour type distribution and analysis period, aggregated in SQLite
+    conn = sqlite3.connect('eliseai_analysis.db')
+    tour_types = conn.execute(
+        'SELECT "Tour Type", COUNT(*) FROM events GROUP BY "Tour Type" ORDER BY COUNT(*) DESC'
+    ).fetchall()
+    first_start, last_end = conn.execute(
+        'SELECT MIN("Start Time"), MAX("End Time") FROM events'
+    ).fetchone()
+    conn.close()
+    first_start = datetime.fromisoformat(first_start)
+    last_end = datetime.fromisoformat(last_end)
+
     print(f"\n📋 Tour Type Distribution:")
-    for tour_type, count in tour_types.items():
+    for tour_type, count in tour_types:
         percentage = (count / len(event_log)) * 100
         print(f"   {tour_type}: {count:,} tours ({percentage:.1f}%)")
-    start_date = event_log['Start Time'].min().strftime('%Y-%m-%d')
-    end_date = event_log['End Time'].max().strftime('%Y-%m-%d')
-    print(f"   📅 Analysis period: {start_date} to {end_date}")
+    print(f"   📅 Analysis period: {first_start.strftime('%Y-%m-%d')} to {last_end.strftime('%Y-%m-%d')}")
     
     # Calculate analysis period in months for trip rate calculation
-    analysis_days = (event_log['End Time'].max() - event_log['Start Time'].min()).days
+    analysis_days = (last_end - first_start).days
     analysis_months = analysis_days / 30.44  # Average days per month
 
-    # Step 2: Setup Database
-    print(f"\n🗄️ Setting up database...")
-    if os.path.exists('eliseai_analysis.db'):
-        os.remove('eliseai_analysis.db')
-    setup_database(event_log, agent_mapping, property_mapping)
-    print(f"✅ Database created with all views")
-
     # Step 3: Geocode Properties
     print(f"\n📍 Loading or geocoding {len(property_mapping)} properties…")
-    property_coords = geocode_properties(property_mapping)
+    property_coords = load_or_geocode_properties(property_mapping)
+    prop_name_map = dict(zip(property_mapping['Property ID'], property_mapping['Property Name']))
     for prop_id, coords in list(property_coords.items())[:3]:
-        prop_name = property_mapping[property_mapping['Property ID'] == prop_id]['Property Name'].iloc[0]
+        prop_name = prop_name_map[prop_id]
         print(f"   {prop_name}: {coords}")
 
     # Step 4: Create Distance Matrix
     print(f"\n📏 Creating distance matrix...")
-    distance_matrix = create_distance_matrix(property_coords)
+    distance_matrix = load_or_create_distance_matrix(property_coords)
     print(f"✅ Distance matrix created: {distance_matrix.shape}")
-    distances = distance_matrix.values[distance_matrix.values > 0]
+    # Off-diagonal travel times only: build the mask once and gather once
+    travel_times = distance_matrix.to_numpy()
+    distances = travel_times[travel_times > 0]
     print(f"   Average: {distances.mean():.1f} min | Min: {distances.min():.1f} min | Max: {distances.max():.1f} min")
 
     # Step 5: Current Travel Analysis
@@ -145,12 +161,14 @@ def main():
     print("=" * 70)
     print("   Analyzing agents likely to be late due to insufficient travel time...")
     
+    # Both analyses look at the same back-to-back tours, so scan the schedule once
+    transitions = compute_travel_transitions(event_log, distance_matrix)
     lateness_results = analyze_agent_lateness_risk(
-        event_log, distance_matrix, agent_mapping, property_mapping
+        event_log, distance_matrix, agent_mapping, property_mapping, transitions=transitions
     )
     
     # Also check for impossible schedules
-    impossible_schedules = analyze_schedule_conflicts(event_log, distance_matrix)
+    impossible_schedules = analyze_schedule_conflicts(event_log, distance_matrix, transitions=transitions)
     
     print("✅ Lateness risk analysis complete!")
     
@@ -175,20 +193,12 @@ def main():
     print("   Analyzing how 'specialized' agents are to specific properties...")
     print("   Comparing before vs. after optimization...")
     
-    # Calculate specialization metrics for original schedule
-    original_specialization = calculate_agent_specialization_metrics(
-        event_log, agent_mapping, property_mapping
-    )
-    
-    # Calculate specialization metrics for optimized schedule
-    optimized_specialization = calculate_agent_specialization_metrics(
-        optimized_event_log, agent_mapping, property_mapping
-    )
-    
-    # Compare before vs after
+    # Compare before vs after; the comparison computes the metrics for both schedules
     specialization_comparison = compare_specialization_before_after(
         event_log, optimized_event_log, agent_mapping, property_mapping
     )
+    original_specialization = specialization_comparison['before_agent_metrics']
+    optimized_specialization = specialization_comparison['after_agent_metrics']
     print("✅ Specialization analysis complete!")
 
     # Step 10: Enhanced Results Display
@@ -248,6 +258,10 @@ def main():
     optimization_df = export_optimization_results(est_results, 'optimization_results_with_trips.csv')
     print(f"✅ Optimization results with trip analysis exported to 'optimization_results_with_trips.csv'")
     
+    # Report writers and plotting are only needed for this export step
+    from agent_specialization import export_specialization_analysis, create_specialization_summary_report
+    from lateness_analysis import export_lateness_analysis
+
     # NEW: Export specialization analysis
     export_specialization_analysis(specialization_comparison, 'specialization_analysis')
     print(f"✅ Specialization analysis exported to specialization_analysis_*.csv files")
@@ -267,6 +281,7 @@ def main():
     
     # NEW: Create lateness visualization
     try:
+        from lateness_analysis import create_lateness_visualizations
         lateness_fig = create_lateness_visualizations(lateness_results)
         lateness_fig.savefig('lateness_analysis_dashboard.png', dpi=300, bbox_inches='tight')
         print(f"📊 Lateness analysis dashboard saved as 'lateness_analysis_dashboard.png'")
@@ -310,7 +325,9 @@ def create_enhanced_summary_report(est_results, analysis_months, shift_metrics,
     optimized_monthly = est_results['optimized_travel_trips'] / analysis_months
     spec_stats = specialization_comparison['summary_stats']
     
-    summary = f"""
+    # Build the report in a single buffer rather than by repeated string concatenation
+    summary = io.StringIO()
+    summary.write(f"""
 ELISEAI TRAVEL OPTIMIZATION ANALYSIS - ENHANCED EXECUTIVE SUMMARY
 ================================================================
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -368,31 +385,31 @@ Trip Efficiency Gain: {est_results['trip_savings_percentage']:.1f}% fewer trips
 Time Efficiency Gain: {est_results['savings_percentage']:.1f}% less travel time required
 Monthly Trip Reduction: {(current_monthly - optimized_monthly):.1f} trips per month
 
-Specialization Impact:"""
+Specialization Impact:""")
     
     if spec_stats['avg_specialization_change'] > 5:
-        summary += f"""
+        summary.write(f"""
 ✅ INCREASED SPECIALIZATION: Optimization makes agents MORE specialized to specific properties.
    • Pros: Improved property familiarity, potential for better customer relationships
    • Cons: Reduced system flexibility, potential scheduling constraints
    • Net Effect: {spec_stats['avg_specialization_change']:+.1f} point increase in specialization
-"""
+""")
     elif spec_stats['avg_specialization_change'] < -5:
-        summary += f"""
+        summary.write(f"""
 ✅ DECREASED SPECIALIZATION: Optimization distributes agents across MORE properties.
    • Pros: Increased system flexibility, better load balancing
    • Cons: Reduced property-specific expertise
    • Net Effect: {spec_stats['avg_specialization_change']:+.1f} point decrease in specialization
-"""
+""")
     else:
-        summary += f"""
+        summary.write(f"""
 ✅ MAINTAINED SPECIALIZATION: Optimization preserves existing agent-property relationships.
    • Pros: Efficiency gains without disrupting established workflows
    • Cons: May miss opportunities for further optimization
    • Net Effect: {spec_stats['avg_specialization_change']:+.1f} point change (minimal impact)
-"""
+""")
 
-    summary += f"""
+    summary.write(f"""
 
 BUSINESS RECOMMENDATIONS:
 ------------------------
@@ -407,10 +424,10 @@ NEXT STEPS:
 • Consider pilot program with agents showing minimal specialization impact
 • Develop training for agents transitioning between properties
 • Monitor customer satisfaction metrics during optimization implementation
-"""
+""")
     
     with open('enhanced_executive_summary.txt', 'w') as f:
-        f.write(summary)
+        f.write(summary.getvalue())
 
 
 if __name__ == "__main__":
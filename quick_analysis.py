@@ -2,6 +2,30 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+# Saved analysis files in examination order, with the columns each examine_* helper
+# reads and their dtypes, so read_csv neither parses other columns nor infers types.
+# Dates stay as text (they are only printed); integer and flag columns use nullable
+# dtypes so a blank cell still loads.
+ANALYSIS_FILE_COLUMNS = {
+    'daily_travel_details.csv': {
+        'agent_id': 'object', 'date': 'object', 'daily_travel_time': 'float64', 'total_tours': 'Int64'
+    },
+    'agent_shift_metrics.csv': {'avg_travel_time_per_shift_minutes': 'float64'},
+    'optimization_results_with_trips.csv': {
+        'travel_savings_minutes': 'float64', 'travel_savings_percentage': 'float64', 'trip_savings': 'Int64'
+    },
+    'lateness_analysis_incidents.csv': {
+        'agent_name': 'object', 'date': 'object', 'is_late': 'boolean', 'lateness_minutes': 'float64',
+        'severity': 'category', 'current_property_name': 'object', 'next_property_name': 'object'
+    },
+    'lateness_analysis_agent_summary.csv': {
+        'agent_name': 'object', 'late_transitions': 'Int64', 'lateness_rate': 'float64'
+    },
+    'impossible_schedules.csv': {
+        'agent_id': 'object', 'date': 'object', 'conflict_severity': 'float64',
+        'available_time': 'float64', 'required_time': 'float64'
+    },
+}
 
 def examine_saved_analysis_files():
     """
@@ -12,22 +36,12 @@ def examine_saved_analysis_files():
     print("🔍 EXAMINING SAVED ANALYSIS RESULTS")
     print("=" * 60)
     
-    # List of files to check
-    files_to_check = [
-        'daily_travel_details.csv',
-        'agent_shift_metrics.csv', 
-        'optimization_results_with_trips.csv',
-        'lateness_analysis_incidents.csv',
-        'lateness_analysis_agent_summary.csv',
-        'impossible_schedules.csv'
-    ]
-    
     available_files = []
     
-    # Check which files exist
-    for filename in files_to_check:
+    # Check which files exist, parsing only the columns the examination uses
+    for filename, schema in ANALYSIS_FILE_COLUMNS.items():
         try:
-            df = pd.read_csv(filename)
+            df = pd.read_csv(filename, usecols=lambda col: col in schema, dtype=schema)
             print(f"✅ Found {filename}: {len(df)} rows")
             available_files.append((filename, df))
         except FileNotFoundError:
@@ -101,17 +115,18 @@ def examine_lateness_incidents(df):
     print(f"   Agents affected: {df['agent_name'].nunique() if 'agent_name' in df.columns else 'Unknown'}")
     
     if len(late_incidents) > 0 and 'lateness_minutes' in df.columns:
-        print(f"   Average lateness: {late_incidents['lateness_minutes'].mean():.1f} minutes")
-        print(f"   Worst lateness: {late_incidents['lateness_minutes'].max():.1f} minutes")
+        lateness_stats = late_incidents['lateness_minutes'].agg(['mean', 'max'])
+        print(f"   Average lateness: {lateness_stats['mean']:.1f} minutes")
+        print(f"   Worst lateness: {lateness_stats['max']:.1f} minutes")
         
         print(f"\n   📋 TOP 5 WORST INCIDENTS:")
         worst_cases = late_incidents.nlargest(5, 'lateness_minutes')
-        for idx, incident in worst_cases.iterrows():
-            agent = incident.get('agent_name', 'Unknown')
-            lateness = incident.get('lateness_minutes', 0)
-            from_prop = incident.get('current_property_name', 'Unknown')
-            to_prop = incident.get('next_property_name', 'Unknown')
-            date = incident.get('date', 'Unknown')
+        for incident in worst_cases.itertuples(index=False):
+            agent = getattr(incident, 'agent_name', 'Unknown')
+            lateness = getattr(incident, 'lateness_minutes', 0)
+            from_prop = getattr(incident, 'current_property_name', 'Unknown')
+            to_prop = getattr(incident, 'next_property_name', 'Unknown')
+            date = getattr(incident, 'date', 'Unknown')
             
             print(f"     {agent}: {lateness:.1f} min late ({from_prop} → {to_prop}) on {date}")
 
@@ -127,7 +142,7 @@ def examine_agent_lateness_summary(df):
     
     # Check for agents with issues
     if 'late_transitions' in df.columns:
-        agents_with_late = len(df[df['late_transitions'] > 0])
+        agents_with_late = (df['late_transitions'] > 0).sum()
         print(f"   Agents with late incidents: {agents_with_late} ({agents_with_late/len(df)*100:.1f}%)")
         
         if 'lateness_rate' in df.columns:
@@ -136,10 +151,10 @@ def examine_agent_lateness_summary(df):
         
         print(f"\n   📋 TOP 5 MOST PROBLEMATIC AGENTS:")
         problematic = df.nlargest(5, 'late_transitions')
-        for idx, agent in problematic.iterrows():
-            name = agent.get('agent_name', 'Unknown')
-            late_count = agent.get('late_transitions', 0)
-            rate = agent.get('lateness_rate', 0) * 100
+        for agent in problematic.itertuples(index=False):
+            name = getattr(agent, 'agent_name', 'Unknown')
+            late_count = getattr(agent, 'late_transitions', 0)
+            rate = getattr(agent, 'lateness_rate', 0) * 100
             print(f"     {name}: {late_count} late incidents ({rate:.1f}% rate)")
 
 
@@ -155,17 +170,18 @@ def examine_impossible_schedules(df):
     print(f"   Agents affected: {df['agent_id'].nunique()}")
     
     if 'conflict_severity' in df.columns:
-        print(f"   Average conflict: {df['conflict_severity'].mean():.1f} minutes")
-        print(f"   Worst conflict: {df['conflict_severity'].max():.1f} minutes")
+        conflict_stats = df['conflict_severity'].agg(['mean', 'max'])
+        print(f"   Average conflict: {conflict_stats['mean']:.1f} minutes")
+        print(f"   Worst conflict: {conflict_stats['max']:.1f} minutes")
         
         print(f"\n   📋 WORST SCHEDULING CONFLICTS:")
         worst_conflicts = df.nlargest(5, 'conflict_severity')
-        for idx, conflict in worst_conflicts.iterrows():
-            agent = conflict.get('agent_id', 'Unknown')
-            severity = conflict.get('conflict_severity', 0)
-            date = conflict.get('date', 'Unknown')
-            available = conflict.get('available_time', 0)
-            required = conflict.get('required_time', 0)
+        for conflict in worst_conflicts.itertuples(index=False):
+            agent = getattr(conflict, 'agent_id', 'Unknown')
+            severity = getattr(conflict, 'conflict_severity', 0)
+            date = getattr(conflict, 'date', 'Unknown')
+            available = getattr(conflict, 'available_time', 0)
+            required = getattr(conflict, 'required_time', 0)
             
             print(f"     Agent {agent}: {severity:.1f} min short on {date}")
             print(f"       Available: {available:.1f} min, Required: {required:.1f} min")
@@ -184,11 +200,11 @@ def examine_daily_travel_details(df):
         if 'agent_id' in df.columns:
             high_travel_days = df.nlargest(5, 'daily_travel_time')
             print(f"\n   📋 HIGHEST TRAVEL TIME DAYS:")
-            for idx, day in high_travel_days.iterrows():
-                agent = day.get('agent_id', 'Unknown')
-                travel_time = day.get('daily_travel_time', 0)
-                date = day.get('date', 'Unknown')
-                tours = day.get('total_tours', 0)
+            for day in high_travel_days.itertuples(index=False):
+                agent = getattr(day, 'agent_id', 'Unknown')
+                travel_time = getattr(day, 'daily_travel_time', 0)
+                date = getattr(day, 'date', 'Unknown')
+                tours = getattr(day, 'total_tours', 0)
                 
                 print(f"     Agent {agent}: {travel_time:.1f} min on {date} ({tours} tours)")
 
@@ -203,7 +219,7 @@ def examine_agent_metrics(df):
         print(f"   System avg travel per shift: {avg_travel_per_shift:.1f} minutes")
         
         # Show distribution
-        high_travel_agents = len(df[df['avg_travel_time_per_shift_minutes'] > avg_travel_per_shift])
+        high_travel_agents = (df['avg_travel_time_per_shift_minutes'] > avg_travel_per_shift).sum()
         print(f"   Agents above average: {high_travel_agents} ({high_travel_agents/len(df)*100:.1f}%)")
 
 
@@ -213,8 +229,9 @@ def examine_optimization_results(df):
     print(f"   Total daily results: {len(df)}")
     
     if 'travel_savings_minutes' in df.columns:
-        total_savings = df['travel_savings_minutes'].sum()
-        avg_savings_pct = df['travel_savings_percentage'].mean()
+        savings_stats = df.agg({'travel_savings_minutes': 'sum', 'travel_savings_percentage': 'mean'})
+        total_savings = savings_stats['travel_savings_minutes']
+        avg_savings_pct = savings_stats['travel_savings_percentage']
         print(f"   Total potential savings: {total_savings:.1f} minutes")
         print(f"   Average savings rate: {avg_savings_pct:.1f}%")
     
@@ -238,7 +255,7 @@ def create_verification_summary(results):
     if 'lateness_incidents' in results:
         lateness_df = results['lateness_incidents']
         if 'is_late' in lateness_df.columns:
-            lateness_count = len(lateness_df[lateness_df['is_late'] == True])
+            lateness_count = int((lateness_df['is_late'] == True).sum())
         else:
             lateness_count = len(lateness_df)  # Assume all are late incidents
     
@@ -246,7 +263,7 @@ def create_verification_summary(results):
     if 'agent_summary' in results:
         agents_df = results['agent_summary']
         if 'late_transitions' in agents_df.columns:
-            agents_affected = len(agents_df[agents_df['late_transitions'] > 0])
+            agents_affected = int((agents_df['late_transitions'] > 0).sum())
     
     print(f"🔍 FINDINGS VERIFICATION:")
     print(f"   Impossible schedules reported: 120")
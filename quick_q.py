@@ -1,11 +1,25 @@
 import sqlite3
+from datetime import date, timedelta
 import pandas as pd
 
+# Agent and day to report on
+AGENT_ID = '0650940d-f99a-48ba-b4f6-cca2a5127b86'
+REPORT_DATE = '2025-05-05'
+
 # Connect to the database
 conn = sqlite3.connect('eliseai_analysis.db')
 
+# Filter shared by the detail and summary queries: a half-open Start Time range
+# instead of DATE(...) = ..., so SQLite can search idx_events_agent_start
+where_clause = """
+WHERE ed."Leasing Agent ID" = ?
+  AND ed."Start Time" >= ?
+  AND ed."Start Time" < ?
+"""
+params = (AGENT_ID, REPORT_DATE, (date.fromisoformat(REPORT_DATE) + timedelta(days=1)).isoformat())
+
 # SQL query to get agent activity for specific date
-query = """
+query = f"""
 SELECT 
     ed."Event ID",
     ed."Property Name",
@@ -17,35 +31,39 @@ SELECT
     ed."Tour Type",
     ed."Duration_Minutes",
     ed."Agent Name"
-FROM event_details ed
-WHERE ed."Leasing Agent ID" = '0650940d-f99a-48ba-b4f6-cca2a5127b86'
-  AND DATE(ed."Start Time") = '2025-05-05'
-ORDER BY ed."Start Time"
+FROM event_details ed{where_clause}ORDER BY ed."Start Time"
 """
 
-# Execute query and get results
-results = pd.read_sql_query(query, conn)
+# Summary statistics are aggregated by SQLite rather than in pandas
+summary_query = f"""
+SELECT 
+    COUNT(*),
+    SUM(ed."Duration_Minutes"),
+    MIN(ed."Start Time"),
+    MAX(ed."End Time")
+FROM event_details ed{where_clause}"""
+
+# Execute query and build the frame straight from the cursor's rows
+cursor = conn.execute(query, params)
+results = pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
 
 # Display results
-print(f"Agent Activity for 2025-05-05")
-print(f"Agent ID: 0650940d-f99a-48ba-b4f6-cca2a5127b86")
+print(f"Agent Activity for {REPORT_DATE}")
+print(f"Agent ID: {AGENT_ID}")
 print(f"Total Tours: {len(results)}")
 print("\nDetailed Schedule:")
 print(results.to_string(index=False))
 
 # Get summary statistics
-if not results.empty:
-    total_duration = results['Duration_Minutes'].sum()
-    first_tour = results['Start Time'].min()
-    last_tour = results['End Time'].max()
-    
+tour_count, total_duration, first_tour, last_tour = conn.execute(summary_query, params).fetchone()
+if tour_count:
     print(f"\nSummary:")
     print(f"Total tour time: {total_duration:.0f} minutes ({total_duration/60:.1f} hours)")
     print(f"First tour: {first_tour}")
     print(f"Last tour: {last_tour}")
     print(f"Agent Name: {results['Agent Name'].iloc[0] if len(results) > 0 else 'N/A'}")
 else:
-    print("\nNo tours found for this agent on 2025-05-05")
+    print(f"\nNo tours found for this agent on {REPORT_DATE}")
 
 # Close connection
 conn.close()
\ No newline at end of file
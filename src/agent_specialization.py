@@ -1,8 +1,7 @@
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-import matplotlib.pyplot as plt
-import seaborn as sns
+from scipy.special import xlogy
+from export_utils import check_export_format
 
 
 def calculate_agent_specialization_metrics(event_log, agent_mapping, property_mapping):
@@ -11,100 +10,140 @@ def calculate_agent_specialization_metrics(event_log, agent_mapping, property_ma
     "specialized" agents are to specific properties.
     
     Returns multiple metrics that can be compared before/after optimization.
+    Tours with a missing agent or property ID cannot be attributed and are left out.
     """
     
-    # Group by agent for analysis
-    agent_specialization = []
-    
-    for agent_id in event_log['Leasing Agent ID'].unique():
-        agent_events = event_log[event_log['Leasing Agent ID'] == agent_id]
-        agent_name = "Unknown"
-        if agent_id in agent_mapping['Agent ID'].values:
-            agent_name = agent_mapping[agent_mapping['Agent ID'] == agent_id]['Agent Name'].iloc[0]
-        
-        # Basic counts
-        total_tours = len(agent_events)
-        unique_properties = agent_events['Property ID'].nunique()
-        property_counts = agent_events['Property ID'].value_counts()
-        
-        # Specialization Metric 1: Property Concentration Index (Herfindahl-Hirschman Index)
-        # Ranges from 1/n (perfectly distributed) to 1 (completely specialized)
-        property_shares = property_counts / total_tours
-        hhi = (property_shares ** 2).sum()
-        
-        # Specialization Metric 2: Percentage of tours at most frequent property
-        most_frequent_property_pct = property_counts.iloc[0] / total_tours if len(property_counts) > 0 else 0
-        most_frequent_property_id = property_counts.index[0] if len(property_counts) > 0 else None
-        
-        # Specialization Metric 3: Percentage of tours at top 3 properties
-        top3_tours = property_counts.head(3).sum()
-        top3_percentage = top3_tours / total_tours if total_tours > 0 else 0
-        
-        # Specialization Metric 4: Shannon Diversity Index (entropy-based)
-        # Higher values = more diverse (less specialized)
-        shannon_diversity = -sum(p * np.log(p) for p in property_shares if p > 0)
-        
-        # Specialization Metric 5: Gini Coefficient for property distribution
-        # 0 = perfectly equal, 1 = maximum inequality (specialization)
-        gini_coeff = calculate_gini_coefficient(property_counts.values)
-        
-        # Specialization Metric 6: Number of properties representing 80% of tours (Pareto)
-        cumulative_pct = property_counts.cumsum() / total_tours
-        properties_for_80pct = len(cumulative_pct[cumulative_pct <= 0.8]) + 1
-        
-        # Tour type specialization (if applicable)
-        tour_type_counts = agent_events['Tour Type'].value_counts()
-        escorted_pct = tour_type_counts.get('ESCORTED', 0) / total_tours if total_tours > 0 else 0
-        virtual_pct = tour_type_counts.get('VIRTUAL_TOUR', 0) / total_tours if total_tours > 0 else 0
-        
-        # Get property name for most frequent property
-        most_frequent_property_name = "N/A"
-        if most_frequent_property_id and most_frequent_property_id in property_mapping['Property ID'].values:
-            most_frequent_property_name = property_mapping[
-                property_mapping['Property ID'] == most_frequent_property_id
-            ]['Property Name'].iloc[0]
-        
-        agent_specialization.append({
-            'agent_id': agent_id,
-            'agent_name': agent_name,
-            'total_tours': total_tours,
-            'unique_properties_served': unique_properties,
-            'property_concentration_index_hhi': hhi,
-            'most_frequent_property_percentage': most_frequent_property_pct,
-            'most_frequent_property_id': most_frequent_property_id,
-            'most_frequent_property_name': most_frequent_property_name,
-            'top3_properties_percentage': top3_percentage,
-            'shannon_diversity_index': shannon_diversity,
-            'gini_coefficient': gini_coeff,
-            'properties_for_80_percent_tours': properties_for_80pct,
-            'escorted_tour_percentage': escorted_pct,
-            'virtual_tour_percentage': virtual_pct,
-            'specialization_score': calculate_composite_specialization_score(
-                hhi, most_frequent_property_pct, unique_properties, total_tours
-            )
-        })
-    
-    return pd.DataFrame(agent_specialization)
+    # factorize codes a missing ID as -1, which would corrupt the pair encoding below
+    has_ids = event_log['Leasing Agent ID'].notna() & event_log['Property ID'].notna()
+    if not has_ids.all():
+        event_log = event_log[has_ids]
+    
+    if len(event_log) == 0:
+        return pd.DataFrame()
+    
+    # Integer codes for the agent and property IDs, numbered in order of first
+    # appearance, so the grouping below hashes small ints instead of UUID strings
+    agent_codes, agent_ids = pd.factorize(event_log['Leasing Agent ID'])
+    property_codes, property_ids = pd.factorize(event_log['Property ID'])
+    
+    # Tours per (agent, property) pair from a single pass over the combined codes
+    n_properties = len(property_ids)
+    pairs, first_seen, tours = np.unique(
+        agent_codes * n_properties + property_codes, return_index=True, return_counts=True
+    )
+    
+    # Within each agent, rank properties by tour count like value_counts (ties keep first appearance).
+    # The ranked arrays are built once and every metric below is a segment reduction over them.
+    ranking = np.lexsort((first_seen, -tours, pairs // n_properties))
+    agent_pos = (pairs // n_properties)[ranking]
+    ranked_property_ids = property_ids.to_numpy()[(pairs % n_properties)[ranking]]
+    tours = tours[ranking]
+    
+    # Segment start of each agent and each pair's rank within its agent
+    offsets = np.flatnonzero(np.r_[True, agent_pos[1:] != agent_pos[:-1]])
+    unique_properties = np.diff(np.r_[offsets, len(tours)])
+    rank_in_agent = np.arange(len(tours)) - np.repeat(offsets, unique_properties)
+    
+    # Basic counts
+    total_tours = np.add.reduceat(tours, offsets)
+    agent_totals = np.repeat(total_tours, unique_properties)
+    
+    # Specialization Metric 1: Property Concentration Index (Herfindahl-Hirschman Index)
+    # Ranges from 1/n (perfectly distributed) to 1 (completely specialized)
+    property_shares = tours / agent_totals
+    hhi = np.add.reduceat(property_shares ** 2, offsets)
+    
+    # Specialization Metric 2: Percentage of tours at most frequent property
+    most_frequent_property_pct = tours[offsets] / total_tours
+    most_frequent_property_id = ranked_property_ids[offsets]
+    
+    # Specialization Metric 3: Percentage of tours at top 3 properties
+    top3_percentage = np.add.reduceat(np.where(rank_in_agent < 3, tours, 0), offsets) / total_tours
+    
+    # Specialization Metric 4: Shannon Diversity Index (entropy-based)
+    # Higher values = more diverse (less specialized)
+    # xlogy treats 0 * log(0) as 0 and evaluates every agent's terms in one call
+    shannon_diversity = np.add.reduceat(-xlogy(property_shares, property_shares), offsets)
+    
+    # Specialization Metric 5: Gini Coefficient for property distribution
+    # 0 = perfectly equal, 1 = maximum inequality (specialization)
+    gini_coeff = gini_vectorized(agent_pos, tours)
+    
+    # Specialization Metric 6: Number of properties representing 80% of tours (Pareto)
+    running_tours = np.cumsum(tours)
+    agent_cumsum = running_tours - np.repeat(running_tours[offsets] - tours[offsets], unique_properties)
+    cumulative_pct = agent_cumsum / agent_totals
+    properties_for_80pct = np.add.reduceat((cumulative_pct <= 0.8).astype(int), offsets) + 1
+    
+    # Tour type specialization (if applicable): one agent x tour type table for all agents
+    tour_type_counts = pd.crosstab(agent_codes, event_log['Tour Type'].to_numpy()).reindex(
+        index=range(len(agent_ids)), columns=['ESCORTED', 'VIRTUAL_TOUR'], fill_value=0
+    )
+    escorted_pct = tour_type_counts['ESCORTED'].to_numpy() / total_tours
+    virtual_pct = tour_type_counts['VIRTUAL_TOUR'].to_numpy() / total_tours
+    
+    # Resolve agent and most-frequent property names through id -> name dicts
+    agent_name_map = dict(zip(agent_mapping['Agent ID'], agent_mapping['Agent Name']))
+    prop_name_map = dict(zip(property_mapping['Property ID'], property_mapping['Property Name']))
+    
+    agent_specialization = pd.DataFrame({
+        'agent_id': agent_ids,
+        'agent_name': [agent_name_map.get(agent_id, "Unknown") for agent_id in agent_ids],
+        'total_tours': total_tours,
+        'unique_properties_served': unique_properties,
+        'property_concentration_index_hhi': hhi,
+        'most_frequent_property_percentage': most_frequent_property_pct,
+        'most_frequent_property_id': most_frequent_property_id,
+        'most_frequent_property_name': [prop_name_map.get(prop_id, "N/A") for prop_id in most_frequent_property_id],
+        'top3_properties_percentage': top3_percentage,
+        'shannon_diversity_index': shannon_diversity,
+        'gini_coefficient': gini_coeff,
+        'properties_for_80_percent_tours': properties_for_80pct,
+        'escorted_tour_percentage': escorted_pct,
+        'virtual_tour_percentage': virtual_pct,
+    })
+    agent_specialization['specialization_score'] = calculate_composite_specialization_score(
+        hhi, most_frequent_property_pct, unique_properties, total_tours
+    )
+    
+    return agent_specialization
 
 
-def calculate_gini_coefficient(values):
-    """Calculate Gini coefficient for measuring inequality in property distribution."""
+def gini_vectorized(codes, values):
+    """
+    Calculate the Gini coefficient of `values` within every group of `codes` at once.
+    Returns one coefficient per distinct code, in ascending code order (0 for a
+    group whose values sum to zero).
+    """
+    codes = np.asarray(codes)
+    values = np.asarray(values)
     if len(values) == 0:
-        return 0
+        return np.zeros(0)
+    
+    # Sort by group, then by value within each group
+    order = np.lexsort((values, codes))
+    codes = codes[order]
+    values = values[order]
+    
+    # Segment boundaries and sizes of each group in the sorted array
+    offsets = np.flatnonzero(np.diff(codes, prepend=codes[0] - 1))
+    n = np.diff(np.append(offsets, len(values)))
     
-    # Sort values
-    sorted_values = np.sort(values)
-    n = len(sorted_values)
+    # Running totals restarted at each group start, reduced per segment
+    cumsum = np.cumsum(values)
+    group_cumsum = cumsum - np.repeat(cumsum[offsets] - values[offsets], n)
+    totals = np.add.reduceat(values, offsets)
+    cumsum_sums = np.add.reduceat(group_cumsum, offsets)
     
-    # Calculate Gini coefficient
-    cumsum = np.cumsum(sorted_values)
-    return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n if cumsum[-1] > 0 else 0
+    safe_totals = np.where(totals > 0, totals, 1)
+    return np.where(totals > 0, (n + 1 - 2 * cumsum_sums / safe_totals) / n, 0.0)
 
 
 def calculate_composite_specialization_score(hhi, most_frequent_pct, unique_properties, total_tours):
     """
     Calculate a composite specialization score from 0 (not specialized) to 100 (highly specialized).
     Combines multiple metrics into a single interpretable score.
+    Accepts scalars or equal-length arrays (one entry per agent).
     """
     # Normalize HHI (0 to 1) to 0-100 scale
     hhi_score = hhi * 100
@@ -114,12 +153,14 @@ def calculate_composite_specialization_score(hhi, most_frequent_pct, unique_prop
     
     # Inverse of property diversity (more properties = less specialized)
     # Scale so that serving 1 property = 100, serving many properties approaches 0
-    diversity_penalty = max(0, 100 - (unique_properties - 1) * 10) if total_tours > 0 else 0
+    diversity_penalty = np.where(
+        np.asarray(total_tours) > 0, np.maximum(0, 100 - (np.asarray(unique_properties) - 1) * 10), 0
+    )
     
     # Weighted average of components
     composite_score = (hhi_score * 0.4 + freq_score * 0.4 + diversity_penalty * 0.2)
     
-    return min(100, composite_score)  # Cap at 100
+    return np.minimum(100, composite_score)  # Cap at 100
 
 
 def analyze_property_coverage(event_log, property_mapping):
@@ -127,38 +168,59 @@ def analyze_property_coverage(event_log, property_mapping):
     Analyze how properties are covered by agents - which properties have 
     dedicated agents vs shared agents.
     """
-    property_coverage = []
-    
-    for property_id in property_mapping['Property ID'].unique():
-        property_events = event_log[event_log['Property ID'] == property_id]
-        property_name = property_mapping[
-            property_mapping['Property ID'] == property_id
-        ]['Property Name'].iloc[0]
-        
-        total_tours = len(property_events)
-        unique_agents = property_events['Leasing Agent ID'].nunique()
-        agent_counts = property_events['Leasing Agent ID'].value_counts()
-        
-        # Property specialization metrics
-        primary_agent_pct = agent_counts.iloc[0] / total_tours if len(agent_counts) > 0 else 0
-        primary_agent_id = agent_counts.index[0] if len(agent_counts) > 0 else None
-        
-        # Gini coefficient for agent distribution at this property
-        gini_coeff = calculate_gini_coefficient(agent_counts.values)
-        
-        property_coverage.append({
-            'property_id': property_id,
-            'property_name': property_name,
-            'total_tours': total_tours,
-            'unique_agents_serving': unique_agents,
-            'primary_agent_percentage': primary_agent_pct,
-            'primary_agent_id': primary_agent_id,
-            'agent_distribution_gini': gini_coeff,
-            'is_single_agent_property': unique_agents == 1,
-            'is_highly_concentrated': primary_agent_pct > 0.8
-        })
-    
-    return pd.DataFrame(property_coverage)
+    # Properties are reported in mapping order, including any without tours
+    property_ids = property_mapping['Property ID'].unique()
+    n_properties = len(property_ids)
+    prop_name_map = dict(zip(property_mapping['Property ID'], property_mapping['Property Name']))
+    
+    # Integer codes per event; tours at properties outside the mapping are ignored
+    property_codes = pd.Index(property_ids).get_indexer(event_log['Property ID'])
+    agent_codes, agent_ids = pd.factorize(event_log['Leasing Agent ID'])
+    mapped = property_codes >= 0
+    total_tours = np.bincount(property_codes[mapped], minlength=n_properties)
+    
+    # Tours without an agent (code -1) still count toward total_tours but not toward any pair
+    attributed = mapped & (agent_codes >= 0)
+    property_codes = property_codes[attributed]
+    agent_codes = agent_codes[attributed]
+    
+    # Tours per (property, agent) pair from a single pass over the combined codes
+    n_agents = max(len(agent_ids), 1)
+    pairs, first_seen, tours = np.unique(
+        property_codes * n_agents + agent_codes, return_index=True, return_counts=True
+    )
+    pair_property = pairs // n_agents
+    pair_agent = pairs % n_agents
+    
+    unique_agents = np.bincount(pair_property, minlength=n_properties)
+    
+    # Primary agent: most tours at the property (ties keep first appearance, like value_counts)
+    ranking = np.lexsort((first_seen, -tours, pair_property))
+    ranked_property = pair_property[ranking]
+    is_primary = np.r_[True, ranked_property[1:] != ranked_property[:-1]] if len(ranking) else np.zeros(0, dtype=bool)
+    served = ranked_property[is_primary]
+    
+    # Property specialization metrics
+    primary_agent_pct = np.zeros(n_properties)
+    primary_agent_pct[served] = tours[ranking][is_primary] / total_tours[served]
+    primary_agent_id = np.full(n_properties, None, dtype=object)
+    primary_agent_id[served] = agent_ids.to_numpy()[pair_agent[ranking][is_primary]]
+    
+    # Gini coefficient for agent distribution at each property
+    gini_coeff = np.zeros(n_properties)
+    gini_coeff[np.unique(pair_property)] = gini_vectorized(pair_property, tours)
+    
+    return pd.DataFrame({
+        'property_id': property_ids,
+        'property_name': [prop_name_map[property_id] for property_id in property_ids],
+        'total_tours': total_tours,
+        'unique_agents_serving': unique_agents,
+        'primary_agent_percentage': primary_agent_pct,
+        'primary_agent_id': primary_agent_id,
+        'agent_distribution_gini': gini_coeff,
+        'is_single_agent_property': unique_agents == 1,
+        'is_highly_concentrated': primary_agent_pct > 0.8
+    })
 
 
 def compare_specialization_before_after(original_events, optimized_events, agent_mapping, property_mapping):
@@ -227,13 +289,13 @@ def compare_specialization_before_after(original_events, optimized_events, agent
     
     # Show biggest changes
     biggest_changes = comparison.nlargest(5, 'specialization_change')
-    for _, agent in biggest_changes.iterrows():
-        print(f"      {agent['agent_name']}: {agent['specialization_score_before']:.1f} → {agent['specialization_score_after']:.1f} ({agent['specialization_change']:+.1f})")
+    for agent in biggest_changes.itertuples(index=False):
+        print(f"      {agent.agent_name}: {agent.specialization_score_before:.1f} → {agent.specialization_score_after:.1f} ({agent.specialization_change:+.1f})")
     
     print(f"\n   Top 5 agents with biggest specialization decreases:")
     biggest_decreases = comparison.nsmallest(5, 'specialization_change')
-    for _, agent in biggest_decreases.iterrows():
-        print(f"      {agent['agent_name']}: {agent['specialization_score_before']:.1f} → {agent['specialization_score_after']:.1f} ({agent['specialization_change']:+.1f})")
+    for agent in biggest_decreases.itertuples(index=False):
+        print(f"      {agent.agent_name}: {agent.specialization_score_before:.1f} → {agent.specialization_score_after:.1f} ({agent.specialization_change:+.1f})")
     
     return {
         'before_agent_metrics': before_metrics,
@@ -252,31 +314,32 @@ def compare_specialization_before_after(original_events, optimized_events, agent
     }
 
 
-def export_specialization_analysis(specialization_comparison, filename_prefix='specialization_analysis'):
-    """Export all specialization analysis results to CSV files."""
-    
-    # Export agent-level metrics
-    specialization_comparison['before_agent_metrics'].to_csv(
-        f'{filename_prefix}_before_agents.csv', index=False
-    )
-    specialization_comparison['after_agent_metrics'].to_csv(
-        f'{filename_prefix}_after_agents.csv', index=False
-    )
+def export_specialization_analysis(specialization_comparison, filename_prefix='specialization_analysis', file_format='csv'):
+    """
+    Export all specialization analysis results to CSV files.
     
-    # Export property coverage
-    specialization_comparison['before_property_coverage'].to_csv(
-        f'{filename_prefix}_before_properties.csv', index=False
-    )
-    specialization_comparison['after_property_coverage'].to_csv(
-        f'{filename_prefix}_after_properties.csv', index=False
-    )
+    Pass file_format='parquet' to write typed, compressed Parquet files instead.
+    """
+    check_export_format(file_format)
+    
+    outputs = {
+        # Agent-level metrics
+        'before_agents': specialization_comparison['before_agent_metrics'],
+        'after_agents': specialization_comparison['after_agent_metrics'],
+        # Property coverage
+        'before_properties': specialization_comparison['before_property_coverage'],
+        'after_properties': specialization_comparison['after_property_coverage'],
+        # Comparison
+        'agent_comparison': specialization_comparison['agent_comparison'],
+    }
     
-    # Export comparison
-    specialization_comparison['agent_comparison'].to_csv(
-        f'{filename_prefix}_agent_comparison.csv', index=False
-    )
+    for suffix, df in outputs.items():
+        if file_format == 'parquet':
+            df.to_parquet(f'{filename_prefix}_{suffix}.parquet', index=False)
+        else:
+            df.to_csv(f'{filename_prefix}_{suffix}.csv', index=False)
     
-    print(f"✅ Specialization analysis exported to {filename_prefix}_*.csv files")
+    print(f"✅ Specialization analysis exported to {filename_prefix}_*.{file_format} files")
     
     return True
 
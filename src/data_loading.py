@@ -1,35 +1,82 @@
+import os
+import pickle
 import pandas as pd
 import sqlite3
 from datetime import datetime
 import numpy as np
 
-def load_excel_data(file_path):
-    """Load all sheets from Excel file"""
+# Default bound-parameter limit of SQLite builds since 3.32
+SQLITE_MAX_VARIABLES = 32766
+
+def load_excel_data(file_path, use_cache=True):
+    """
+    Load all sheets from Excel file.
+    
+    The cleaned frames are pickled next to the workbook and reused while the
+    pickle is newer than both the workbook and this loader, so re-runs skip
+    parsing the Excel XML.
+    """
+    cache_path = os.path.splitext(file_path)[0] + '.cache.pkl'
+    if use_cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= max(
+        os.path.getmtime(file_path), os.path.getmtime(__file__)
+    ):
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
     
-    # Load each sheet
-    event_log = pd.read_excel(file_path, sheet_name='AGENT CALENDAR EVENT LOG')
-    agent_mapping = pd.read_excel(file_path, sheet_name='Agent Mapping')
-    property_mapping = pd.read_excel(file_path, sheet_name='Property Mapping')
+    # Load all sheets from a single open of the workbook
+    sheets = pd.read_excel(file_path, sheet_name=['AGENT CALENDAR EVENT LOG', 'Agent Mapping', 'Property Mapping'])
+    event_log = sheets['AGENT CALENDAR EVENT LOG']
+    agent_mapping = sheets['Agent Mapping']
+    property_mapping = sheets['Property Mapping']
     
     # Clean and process event log
     event_log['Start Time'] = pd.to_datetime(event_log['Start Time'])
     event_log['End Time'] = pd.to_datetime(event_log['End Time'])
-    event_log['Duration_Minutes'] = (event_log['End Time'] - event_log['Start Time']).dt.total_seconds() / 60
-    event_log['Date'] = event_log['Start Time'].dt.date
+    start_ns = event_log['Start Time'].to_numpy().view('i8')
+    end_ns = event_log['End Time'].to_numpy().view('i8')
+    # NaT views as the minimum int64, so a missing time must be masked back to NaN
+    missing_time = event_log['Start Time'].isna().to_numpy() | event_log['End Time'].isna().to_numpy()
+    event_log['Duration_Minutes'] = np.where(missing_time, np.nan, (end_ns - start_ns) / 6e10)
+    event_log['Date'] = event_log['Start Time'].dt.normalize()
+    # Few distinct values, compared in every analysis: int8 codes instead of strings
+    event_log['Tour Type'] = event_log['Tour Type'].astype('category')
+    
+    if use_cache:
+        with open(cache_path, 'wb') as f:
+            pickle.dump((event_log, agent_mapping, property_mapping), f, protocol=pickle.HIGHEST_PROTOCOL)
     
     return event_log, agent_mapping, property_mapping
 
-def setup_database(event_log, agent_mapping, property_mapping):
-    """Create SQLite database with all tables"""
+def setup_database(event_log, agent_mapping, property_mapping, chunksize=10000):
+    """
+    Create SQLite database with all tables.
+
+    Each table is bulk-inserted by to_sql as multi-row INSERT statements of up
+    to `chunksize` rows (capped by SQLite's bound-parameter limit) inside a
+    single transaction per table. Indexes and views are created after the load.
+    """
     conn = sqlite3.connect('eliseai_analysis.db')
 
-    # Create tables
-    event_log.to_sql('events', conn, if_exists='replace', index=False)
-    agent_mapping.to_sql('agents', conn, if_exists='replace', index=False)
-    property_mapping.to_sql('properties', conn, if_exists='replace', index=False)
+    # Bulk-load phase: no fsyncs and an in-memory rollback journal
+    conn.execute('PRAGMA journal_mode=MEMORY')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-262144')
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+    # Create tables (Date is stored as a plain DATE, not a midnight timestamp)
+    tables = {
+        'events': event_log.assign(Date=event_log['Date'].dt.date),
+        'agents': agent_mapping,
+        'properties': property_mapping
+    }
+    for name, table in tables.items():
+        # One INSERT may bind at most SQLITE_MAX_VARIABLES values
+        rows_per_insert = max(1, min(chunksize, SQLITE_MAX_VARIABLES // len(table.columns)))
+        table.to_sql(name, conn, if_exists='replace', index=False, chunksize=rows_per_insert, method='multi')
 
     # Create indexes for performance
-    conn.execute('CREATE INDEX idx_events_agent_id ON events("Leasing Agent ID")')
+    # Agent lookups use the leading column; agent-day schedules also range-scan Start Time
+    conn.execute('CREATE INDEX idx_events_agent_start ON events("Leasing Agent ID", "Start Time")')
     conn.execute('CREATE INDEX idx_events_property_id ON events("Property ID")')
     conn.execute('CREATE INDEX idx_events_start_time ON events("Start Time")')
 
@@ -69,7 +116,16 @@ def setup_database(event_log, agent_mapping, property_mapping):
     GROUP BY "Date", "Leasing Agent ID", "Agent Name"
     ORDER BY "Date", "Leasing Agent ID"
     ''')
-    
+
+    # Analytical phase: WAL persists in the database file, so later readers
+    # (db_explorer, quick_q) get non-blocking reads without changing it themselves
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+    # Gather planner statistics so the first downstream queries pick the indexes
+    conn.execute('ANALYZE')
+    conn.commit()
+
     conn.close()
     return "Database created successfully"
 
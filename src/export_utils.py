@@ -0,0 +1,15 @@
+import importlib.util
+
+
+def check_export_format(file_format):
+    """
+    Validate an exporter's file_format ('csv' or 'parquet'). Parquet needs an
+    engine (pyarrow or fastparquet) that is not in requirements.txt, so fail
+    before writing anything when none is installed.
+    """
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported file_format: {file_format}")
+    if file_format == 'parquet' and not any(
+        importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet')
+    ):
+        raise ImportError("file_format='parquet' needs pyarrow or fastparquet; install one or use 'csv'")
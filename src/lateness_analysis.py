@@ -1,137 +1,159 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import defaultdict
+from export_utils import check_export_format
+from travel_analysis import matrix_positions
 
 
-def analyze_agent_lateness_risk(event_log, distance_matrix, agent_mapping, property_mapping):
+def compute_travel_transitions(event_log, distance_matrix):
+    """
+    Find every back-to-back pair of escorted tours by the same agent on the same day
+    at different properties, with the available and required travel time in minutes.
+    
+    Rows are positions in event_log; shared by the lateness and conflict analyses.
+    """
+    # Encode the columns the scan needs as flat integer arrays
+    agent_codes, agent_ids = pd.factorize(event_log['Leasing Agent ID'])
+    date_codes = pd.factorize(event_log['Date'])[0]
+    start_ns = event_log['Start Time'].astype('int64').to_numpy()
+    end_ns = event_log['End Time'].astype('int64').to_numpy()
+    escorted = (event_log['Tour Type'] == 'ESCORTED').to_numpy()
+    property_ids = event_log['Property ID'].to_numpy()
+    
+    # Order every agent's tours by start time in one sort; agents keep their order of
+    # first appearance and tours with equal start times keep their original row order
+    order = np.lexsort((start_ns, agent_codes))
+    agent_codes, date_codes, start_ns, end_ns, escorted, property_ids = (
+        col[order] for col in (agent_codes, date_codes, start_ns, end_ns, escorted, property_ids)
+    )
+    
+    # Compare each tour with the next row: only escorted -> escorted tours by the same agent
+    # on the same day at different properties need travel (virtual tours don't require travel)
+    travel_required = (
+        (agent_codes[:-1] == agent_codes[1:]) & escorted[:-1] & escorted[1:] &
+        (date_codes[:-1] == date_codes[1:]) & (property_ids[:-1] != property_ids[1:])
+    )
+    current_rows = np.flatnonzero(travel_required)
+    next_rows = current_rows + 1
+    
+    # Get required travel time for every transition with one positional gather
+    required_travel_time = distance_matrix.to_numpy()[
+        matrix_positions(distance_matrix.index, property_ids[current_rows]),
+        matrix_positions(distance_matrix.columns, property_ids[next_rows])
+    ]
+    
+    return {
+        'agent_ids': agent_ids,
+        'agent_codes': agent_codes[current_rows],
+        'current_rows': order[current_rows],
+        'next_rows': order[next_rows],
+        'available_time': (start_ns[next_rows] - end_ns[current_rows]) / 1e9 / 60,
+        'required_travel_time': required_travel_time
+    }
+
+
+def analyze_agent_lateness_risk(event_log, distance_matrix, agent_mapping, property_mapping, transitions=None, verbose=True):
     """
     Analyze how many agents are likely to be late to their tours due to 
     insufficient travel time between back-to-back appointments.
     
+    Pass transitions from compute_travel_transitions to reuse an existing scan.
+    With verbose=False nothing is printed and the report rankings are skipped.
     Returns detailed analysis of lateness risks and problematic transitions.
     """
-    print("\n⏰ ANALYZING AGENT LATENESS RISK")
-    print("=" * 60)
-    print("   Identifying tours where agents may arrive late due to travel time...")
-    
-    lateness_incidents = []
-    agent_lateness_summary = []
-    daily_lateness_stats = []
-    
-    # Analyze each agent's schedule
-    for agent_id in event_log['Leasing Agent ID'].unique():
-        agent_events = event_log[event_log['Leasing Agent ID'] == agent_id].copy()
-        agent_events = agent_events.sort_values('Start Time').reset_index(drop=True)
-        
-        agent_name = "Unknown"
-        if agent_id in agent_mapping['Agent ID'].values:
-            agent_name = agent_mapping[agent_mapping['Agent ID'] == agent_id]['Agent Name'].iloc[0]
-        
-        total_transitions = 0
-        late_transitions = 0
-        risky_transitions = 0  # Within 5 minutes of being late
-        total_lateness_minutes = 0
-        max_lateness = 0
-        
-        # Analyze consecutive tours
-        for i in range(len(agent_events) - 1):
-            current_tour = agent_events.iloc[i]
-            next_tour = agent_events.iloc[i + 1]
-            
-            # Only analyze escorted tours (virtual tours don't require travel)
-            if current_tour['Tour Type'] == 'ESCORTED' and next_tour['Tour Type'] == 'ESCORTED':
-                # Check if tours are on the same day
-                if current_tour['Date'] == next_tour['Date']:
-                    current_property = current_tour['Property ID']
-                    next_property = next_tour['Property ID']
-                    
-                    # Only analyze if properties are different (travel required)
-                    if current_property != next_property:
-                        total_transitions += 1
-                        
-                        # Calculate available time between tours
-                        available_time = (next_tour['Start Time'] - current_tour['End Time']).total_seconds() / 60
-                        
-                        # Get required travel time
-                        required_travel_time = distance_matrix.loc[current_property, next_property]
-                        
-                        # Calculate lateness (negative means early, positive means late)
-                        lateness_minutes = required_travel_time - available_time
-                        
-                        # Categorize the transition
-                        is_late = lateness_minutes > 0
-                        is_risky = lateness_minutes > -5 and lateness_minutes <= 0  # Within 5 min buffer
-                        
-                        if is_late:
-                            late_transitions += 1
-                            total_lateness_minutes += lateness_minutes
-                            max_lateness = max(max_lateness, lateness_minutes)
-                        elif is_risky:
-                            risky_transitions += 1
-                        
-                        # Get property names for reporting
-                        current_prop_name = property_mapping[
-                            property_mapping['Property ID'] == current_property
-                        ]['Property Name'].iloc[0] if current_property in property_mapping['Property ID'].values else "Unknown"
-                        
-                        next_prop_name = property_mapping[
-                            property_mapping['Property ID'] == next_property
-                        ]['Property Name'].iloc[0] if next_property in property_mapping['Property ID'].values else "Unknown"
-                        
-                        # Record the incident
-                        lateness_incidents.append({
-                            'agent_id': agent_id,
-                            'agent_name': agent_name,
-                            'date': current_tour['Date'],
-                            'current_tour_end': current_tour['End Time'],
-                            'next_tour_start': next_tour['Start Time'],
-                            'current_property': current_property,
-                            'next_property': next_property,
-                            'current_property_name': current_prop_name,
-                            'next_property_name': next_prop_name,
-                            'available_time_minutes': available_time,
-                            'required_travel_time_minutes': required_travel_time,
-                            'lateness_minutes': lateness_minutes,
-                            'is_late': is_late,
-                            'is_risky': is_risky,
-                            'severity': 'LATE' if is_late else ('RISKY' if is_risky else 'OK')
-                        })
-        
-        # Calculate agent-level statistics
-        lateness_rate = late_transitions / total_transitions if total_transitions > 0 else 0
-        risk_rate = (late_transitions + risky_transitions) / total_transitions if total_transitions > 0 else 0
-        avg_lateness = total_lateness_minutes / late_transitions if late_transitions > 0 else 0
-        
-        agent_lateness_summary.append({
-            'agent_id': agent_id,
-            'agent_name': agent_name,
-            'total_travel_transitions': total_transitions,
-            'late_transitions': late_transitions,
-            'risky_transitions': risky_transitions,
-            'on_time_transitions': total_transitions - late_transitions - risky_transitions,
-            'lateness_rate': lateness_rate,
-            'risk_rate': risk_rate,
-            'total_lateness_minutes': total_lateness_minutes,
-            'avg_lateness_per_incident': avg_lateness,
-            'max_lateness_minutes': max_lateness,
-            'has_lateness_issues': late_transitions > 0 or risky_transitions > 0
-        })
+    if verbose:
+        print("\n⏰ ANALYZING AGENT LATENESS RISK")
+        print("=" * 60)
+        print("   Identifying tours where agents may arrive late due to travel time...")
+    
+    if transitions is None:
+        transitions = compute_travel_transitions(event_log, distance_matrix)
+    agent_ids = transitions['agent_ids']
+    transition_agent = transitions['agent_codes']
+    current_tours = event_log.iloc[transitions['current_rows']]
+    current_property = current_tours['Property ID'].to_numpy()
+    next_property = event_log['Property ID'].to_numpy()[transitions['next_rows']]
+    available_time = transitions['available_time']
+    required_travel_time = transitions['required_travel_time']
+    
+    # Calculate lateness (negative means early, positive means late)
+    lateness_minutes = required_travel_time - available_time
+    
+    # Categorize the transitions
+    is_late = lateness_minutes > 0
+    is_risky = (lateness_minutes > -5) & (lateness_minutes <= 0)  # Within 5 min buffer
+    
+    # Get agent and property names for reporting
+    agent_name_map = dict(zip(agent_mapping['Agent ID'], agent_mapping['Agent Name']))
+    prop_name_map = dict(zip(property_mapping['Property ID'], property_mapping['Property Name']))
+    agent_name_list = np.array([agent_name_map.get(agent_id, "Unknown") for agent_id in agent_ids], dtype=object)
+    
+    # Record the incidents (repeated name and severity strings are stored as categoricals)
+    incidents_df = pd.DataFrame({
+        'agent_id': current_tours['Leasing Agent ID'].to_numpy(),
+        'agent_name': pd.Categorical(agent_name_list[transition_agent]),
+        'date': current_tours['Date'].to_numpy(),
+        'current_tour_end': current_tours['End Time'].to_numpy(),
+        'next_tour_start': event_log['Start Time'].to_numpy()[transitions['next_rows']],
+        'current_property': current_property,
+        'next_property': next_property,
+        'current_property_name': pd.Categorical([prop_name_map.get(prop_id, "Unknown") for prop_id in current_property]),
+        'next_property_name': pd.Categorical([prop_name_map.get(prop_id, "Unknown") for prop_id in next_property]),
+        'available_time_minutes': available_time,
+        'required_travel_time_minutes': required_travel_time,
+        'lateness_minutes': lateness_minutes,
+        'is_late': is_late,
+        'is_risky': is_risky,
+        'severity': pd.Categorical.from_codes(
+            np.where(is_late, 2, np.where(is_risky, 1, 0)), categories=['OK', 'RISKY', 'LATE'], ordered=True
+        )
+    })
+    
+    # Calculate agent-level statistics
+    n_agents = len(agent_ids)
+    total_transitions = np.bincount(transition_agent, minlength=n_agents)
+    late_transitions = np.bincount(transition_agent[is_late], minlength=n_agents)
+    risky_transitions = np.bincount(transition_agent[is_risky], minlength=n_agents)
+    total_lateness_minutes = np.bincount(transition_agent[is_late], weights=lateness_minutes[is_late], minlength=n_agents)
+    max_lateness = (
+        pd.Series(lateness_minutes[is_late]).groupby(transition_agent[is_late]).max()
+        .reindex(range(n_agents), fill_value=0).to_numpy()
+    )
+    
+    has_transitions = total_transitions > 0
+    has_late = late_transitions > 0
+    lateness_rate = np.where(has_transitions, late_transitions / np.where(has_transitions, total_transitions, 1), 0)
+    risk_rate = np.where(has_transitions, (late_transitions + risky_transitions) / np.where(has_transitions, total_transitions, 1), 0)
+    avg_lateness = np.where(has_late, total_lateness_minutes / np.where(has_late, late_transitions, 1), 0)
+    
+    agents_df = pd.DataFrame({
+        'agent_id': agent_ids,
+        'agent_name': agent_name_list,
+        'total_travel_transitions': total_transitions,
+        'late_transitions': late_transitions,
+        'risky_transitions': risky_transitions,
+        'on_time_transitions': total_transitions - late_transitions - risky_transitions,
+        'lateness_rate': lateness_rate,
+        'risk_rate': risk_rate,
+        'total_lateness_minutes': total_lateness_minutes,
+        'avg_lateness_per_incident': avg_lateness,
+        'max_lateness_minutes': max_lateness,
+        'has_lateness_issues': has_late | (risky_transitions > 0)
+    })
     
     # Analyze by date
-    incidents_df = pd.DataFrame(lateness_incidents)
     if len(incidents_df) > 0:
-        daily_stats = incidents_df.groupby('date').agg({
+        # Only sum positive lateness
+        positive_lateness = incidents_df['lateness_minutes'].clip(lower=0)
+        daily_stats = incidents_df.assign(positive_lateness=positive_lateness).groupby('date').agg({
             'is_late': 'sum',
             'is_risky': 'sum',
-            'lateness_minutes': lambda x: x[x > 0].sum(),  # Only sum positive lateness
+            'positive_lateness': 'sum',
             'agent_id': 'nunique'
         }).rename(columns={
             'is_late': 'late_incidents',
             'is_risky': 'risky_incidents', 
-            'lateness_minutes': 'total_daily_lateness',
+            'positive_lateness': 'total_daily_lateness',
             'agent_id': 'agents_with_issues'
         }).reset_index()
         
@@ -140,7 +162,6 @@ def analyze_agent_lateness_risk(event_log, distance_matrix, agent_mapping, prope
         daily_stats = pd.DataFrame()
     
     # Calculate system-wide statistics
-    agents_df = pd.DataFrame(agent_lateness_summary)
     total_agents = len(agents_df)
     agents_with_late_incidents = len(agents_df[agents_df['late_transitions'] > 0])
     agents_with_any_issues = len(agents_df[agents_df['has_lateness_issues']])
@@ -150,30 +171,31 @@ def analyze_agent_lateness_risk(event_log, distance_matrix, agent_mapping, prope
     system_lateness_rate = total_late_incidents / total_transitions if total_transitions > 0 else 0
     system_risk_rate = (total_late_incidents + total_risky_incidents) / total_transitions if total_transitions > 0 else 0
     
-    print(f"✅ Lateness analysis complete!")
-    print(f"\n📊 SYSTEM-WIDE LATENESS STATISTICS:")
-    print(f"   Total Agents Analyzed: {total_agents}")
-    print(f"   Agents with Late Incidents: {agents_with_late_incidents} ({agents_with_late_incidents/total_agents*100:.1f}%)")
-    print(f"   Agents with Any Timing Issues: {agents_with_any_issues} ({agents_with_any_issues/total_agents*100:.1f}%)")
-    print(f"   Total Travel Transitions: {total_transitions:,}")
-    print(f"   Late Transitions: {total_late_incidents:,} ({system_lateness_rate*100:.1f}%)")
-    print(f"   Risky Transitions: {total_risky_incidents:,} ({(total_risky_incidents/total_transitions*100) if total_transitions > 0 else 0:.1f}%)")
-    print(f"   Combined Risk Rate: {system_risk_rate*100:.1f}%")
-    print(f"   Average Lateness per Incident: {agents_df['avg_lateness_per_incident'].mean():.1f} minutes")
+    if verbose:
+        print(f"✅ Lateness analysis complete!")
+        print(f"\n📊 SYSTEM-WIDE LATENESS STATISTICS:")
+        print(f"   Total Agents Analyzed: {total_agents}")
+        print(f"   Agents with Late Incidents: {agents_with_late_incidents} ({agents_with_late_incidents/total_agents*100:.1f}%)")
+        print(f"   Agents with Any Timing Issues: {agents_with_any_issues} ({agents_with_any_issues/total_agents*100:.1f}%)")
+        print(f"   Total Travel Transitions: {total_transitions:,}")
+        print(f"   Late Transitions: {total_late_incidents:,} ({system_lateness_rate*100:.1f}%)")
+        print(f"   Risky Transitions: {total_risky_incidents:,} ({(total_risky_incidents/total_transitions*100) if total_transitions > 0 else 0:.1f}%)")
+        print(f"   Combined Risk Rate: {system_risk_rate*100:.1f}%")
+        print(f"   Average Lateness per Incident: {agents_df['avg_lateness_per_incident'].mean():.1f} minutes")
     
-    if len(incidents_df) > 0:
-        worst_incidents = incidents_df[incidents_df['is_late']].nlargest(5, 'lateness_minutes')
-        print(f"\n⚠️  TOP 5 WORST LATENESS INCIDENTS:")
-        for _, incident in worst_incidents.iterrows():
-            print(f"   {incident['agent_name']}: {incident['lateness_minutes']:.1f} min late")
-            print(f"      {incident['current_property_name']} → {incident['next_property_name']} on {incident['date']}")
-    
-    # Identify most problematic agents
-    problematic_agents = agents_df[agents_df['has_lateness_issues']].nlargest(5, 'late_transitions')
-    print(f"\n👤 TOP 5 AGENTS WITH MOST LATENESS ISSUES:")
-    for _, agent in problematic_agents.iterrows():
-        print(f"   {agent['agent_name']}: {agent['late_transitions']} late, {agent['risky_transitions']} risky")
-        print(f"      Lateness rate: {agent['lateness_rate']*100:.1f}%, Avg late by: {agent['avg_lateness_per_incident']:.1f} min")
+        if len(incidents_df) > 0:
+            worst_incidents = incidents_df[incidents_df['is_late']].nlargest(5, 'lateness_minutes')
+            print(f"\n⚠️  TOP 5 WORST LATENESS INCIDENTS:")
+            for incident in worst_incidents.itertuples(index=False):
+                print(f"   {incident.agent_name}: {incident.lateness_minutes:.1f} min late")
+                print(f"      {incident.current_property_name} → {incident.next_property_name} on {incident.date:%Y-%m-%d}")
+    
+        # Identify most problematic agents
+        problematic_agents = agents_df[agents_df['has_lateness_issues']].nlargest(5, 'late_transitions')
+        print(f"\n👤 TOP 5 AGENTS WITH MOST LATENESS ISSUES:")
+        for agent in problematic_agents.itertuples(index=False):
+            print(f"   {agent.agent_name}: {agent.late_transitions} late, {agent.risky_transitions} risky")
+            print(f"      Lateness rate: {agent.lateness_rate*100:.1f}%, Avg late by: {agent.avg_lateness_per_incident:.1f} min")
     
     return {
         'incidents_df': incidents_df,
@@ -193,57 +215,43 @@ def analyze_agent_lateness_risk(event_log, distance_matrix, agent_mapping, prope
     }
 
 
-def analyze_schedule_conflicts(event_log, distance_matrix, buffer_minutes=5):
+def analyze_schedule_conflicts(event_log, distance_matrix, buffer_minutes=5, transitions=None, verbose=True):
     """
     Identify scheduling conflicts where tours overlap when accounting for travel time.
     This is different from lateness - these are impossible schedules.
     """
-    print(f"\n🚨 ANALYZING IMPOSSIBLE SCHEDULES (with {buffer_minutes} min buffer)")
-    print("=" * 60)
+    if verbose:
+        print(f"\n🚨 ANALYZING IMPOSSIBLE SCHEDULES (with {buffer_minutes} min buffer)")
+        print("=" * 60)
     
-    conflicts = []
+    if transitions is None:
+        transitions = compute_travel_transitions(event_log, distance_matrix)
     
-    for agent_id in event_log['Leasing Agent ID'].unique():
-        agent_events = event_log[event_log['Leasing Agent ID'] == agent_id].copy()
-        agent_events = agent_events.sort_values('Start Time').reset_index(drop=True)
-        
-        for i in range(len(agent_events) - 1):
-            current_tour = agent_events.iloc[i]
-            next_tour = agent_events.iloc[i + 1]
-            
-            # Only check escorted tours on same day
-            if (current_tour['Tour Type'] == 'ESCORTED' and 
-                next_tour['Tour Type'] == 'ESCORTED' and
-                current_tour['Date'] == next_tour['Date']):
-                
-                current_property = current_tour['Property ID']
-                next_property = next_tour['Property ID']
-                
-                if current_property != next_property:
-                    # Calculate if schedule is physically impossible
-                    available_time = (next_tour['Start Time'] - current_tour['End Time']).total_seconds() / 60
-                    required_time = distance_matrix.loc[current_property, next_property] + buffer_minutes
-                    
-                    if available_time < required_time:
-                        conflicts.append({
-                            'agent_id': agent_id,
-                            'date': current_tour['Date'],
-                            'conflict_severity': required_time - available_time,
-                            'available_time': available_time,
-                            'required_time': required_time,
-                            'current_tour_end': current_tour['End Time'],
-                            'next_tour_start': next_tour['Start Time']
-                        })
-    
-    conflicts_df = pd.DataFrame(conflicts)
-    
-    if len(conflicts_df) > 0:
-        print(f"   Impossible Schedules Found: {len(conflicts_df)}")
-        print(f"   Agents Affected: {conflicts_df['agent_id'].nunique()}")
-        print(f"   Average Conflict Severity: {conflicts_df['conflict_severity'].mean():.1f} minutes")
-        print(f"   Worst Conflict: {conflicts_df['conflict_severity'].max():.1f} minutes short")
-    else:
-        print(f"   No impossible schedules found!")
+    # Calculate if schedule is physically impossible
+    available_time = transitions['available_time']
+    required_time = transitions['required_travel_time'] + buffer_minutes
+    is_conflict = available_time < required_time
+    current_rows = transitions['current_rows'][is_conflict]
+    next_rows = transitions['next_rows'][is_conflict]
+    
+    conflicts_df = pd.DataFrame({
+        'agent_id': event_log['Leasing Agent ID'].to_numpy()[current_rows],
+        'date': event_log['Date'].to_numpy()[current_rows],
+        'conflict_severity': required_time[is_conflict] - available_time[is_conflict],
+        'available_time': available_time[is_conflict],
+        'required_time': required_time[is_conflict],
+        'current_tour_end': event_log['End Time'].to_numpy()[current_rows],
+        'next_tour_start': event_log['Start Time'].to_numpy()[next_rows]
+    })
+    
+    if verbose:
+        if len(conflicts_df) > 0:
+            print(f"   Impossible Schedules Found: {len(conflicts_df)}")
+            print(f"   Agents Affected: {conflicts_df['agent_id'].nunique()}")
+            print(f"   Average Conflict Severity: {conflicts_df['conflict_severity'].mean():.1f} minutes")
+            print(f"   Worst Conflict: {conflicts_df['conflict_severity'].max():.1f} minutes short")
+        else:
+            print(f"   No impossible schedules found!")
     
     return conflicts_df
 
@@ -253,6 +261,9 @@ def create_lateness_visualizations(lateness_results):
     Create visualizations for the lateness analysis.
     Returns matplotlib figure objects that can be saved or displayed.
     """
+    # matplotlib is only needed for the dashboard, so load it on first use
+    import matplotlib.pyplot as plt
+    
     incidents_df = lateness_results['incidents_df']
     agents_df = lateness_results['agent_summary_df']
     system_stats = lateness_results['system_stats']
@@ -274,7 +285,7 @@ def create_lateness_visualizations(lateness_results):
     
     # 2. Agent lateness distribution
     if len(agents_df) > 0:
-        lateness_rates = agents_df['lateness_rate'] * 100
+        lateness_rates = agents_df['lateness_rate'].to_numpy() * 100
         axes[0,1].hist(lateness_rates, bins=10, color='skyblue', edgecolor='black', alpha=0.7)
         axes[0,1].set_xlabel('Lateness Rate (%)')
         axes[0,1].set_ylabel('Number of Agents')
@@ -285,7 +296,7 @@ def create_lateness_visualizations(lateness_results):
     # 3. Top problematic agents
     if len(agents_df) > 0:
         top_problem_agents = agents_df.nlargest(10, 'late_transitions')
-        axes[0,2].barh(range(len(top_problem_agents)), top_problem_agents['late_transitions'], color='coral')
+        axes[0,2].barh(np.arange(len(top_problem_agents)), top_problem_agents['late_transitions'].to_numpy(), color='coral')
         axes[0,2].set_yticks(range(len(top_problem_agents)))
         axes[0,2].set_yticklabels([name[:15] + '...' if len(name) > 15 else name 
                                   for name in top_problem_agents['agent_name']], fontsize=8)
@@ -295,9 +306,9 @@ def create_lateness_visualizations(lateness_results):
     # 4. Daily lateness trends
     if len(lateness_results['daily_stats_df']) > 0:
         daily_stats = lateness_results['daily_stats_df']
-        dates = pd.to_datetime(daily_stats['date'])
-        axes[1,0].plot(dates, daily_stats['late_incidents'], marker='o', color='red', label='Late')
-        axes[1,0].plot(dates, daily_stats['risky_incidents'], marker='s', color='orange', label='Risky')
+        dates = daily_stats['date'].to_numpy(dtype='datetime64[ns]')
+        axes[1,0].plot(dates, daily_stats['late_incidents'].to_numpy(), marker='o', color='red', label='Late')
+        axes[1,0].plot(dates, daily_stats['risky_incidents'].to_numpy(), marker='s', color='orange', label='Risky')
         axes[1,0].set_xlabel('Date')
         axes[1,0].set_ylabel('Number of Incidents')
         axes[1,0].set_title('Daily Lateness Incidents Over Time')
@@ -306,15 +317,14 @@ def create_lateness_visualizations(lateness_results):
     
     # 5. Lateness severity distribution
     if len(incidents_df) > 0:
-        late_incidents = incidents_df[incidents_df['is_late']]
-        if len(late_incidents) > 0:
-            axes[1,1].hist(late_incidents['lateness_minutes'], bins=15, color='lightcoral', 
-                          edgecolor='black', alpha=0.7)
+        late_minutes = incidents_df['lateness_minutes'].to_numpy()[incidents_df['is_late'].to_numpy()]
+        if len(late_minutes) > 0:
+            axes[1,1].hist(late_minutes, bins=15, color='lightcoral', edgecolor='black', alpha=0.7)
             axes[1,1].set_xlabel('Minutes Late')
             axes[1,1].set_ylabel('Number of Incidents')
             axes[1,1].set_title('Distribution of Lateness Severity')
-            axes[1,1].axvline(late_incidents['lateness_minutes'].mean(), color='darkred', 
-                             linestyle='--', label=f'Mean: {late_incidents["lateness_minutes"].mean():.1f} min')
+            axes[1,1].axvline(late_minutes.mean(), color='darkred', 
+                             linestyle='--', label=f'Mean: {late_minutes.mean():.1f} min')
             axes[1,1].legend()
     
     # 6. Summary statistics text
@@ -338,18 +348,30 @@ System Statistics:
     return fig
 
 
-def export_lateness_analysis(lateness_results, filename_prefix='lateness_analysis'):
-    """Export lateness analysis results to CSV files."""
-    
-    # Export detailed incidents
-    lateness_results['incidents_df'].to_csv(f'{filename_prefix}_incidents.csv', index=False)
+def export_lateness_analysis(lateness_results, filename_prefix='lateness_analysis', file_format='csv'):
+    """
+    Export lateness analysis results to CSV files.
     
-    # Export agent summary
-    lateness_results['agent_summary_df'].to_csv(f'{filename_prefix}_agent_summary.csv', index=False)
+    Pass file_format='parquet' to write typed, compressed Parquet files instead.
+    The summary report is always plain text.
+    """
+    check_export_format(file_format)
     
-    # Export daily statistics
+    outputs = {
+        # Detailed incidents
+        'incidents': lateness_results['incidents_df'],
+        # Agent summary
+        'agent_summary': lateness_results['agent_summary_df'],
+    }
+    # Daily statistics
     if len(lateness_results['daily_stats_df']) > 0:
-        lateness_results['daily_stats_df'].to_csv(f'{filename_prefix}_daily_stats.csv', index=False)
+        outputs['daily_stats'] = lateness_results['daily_stats_df']
+    
+    for suffix, df in outputs.items():
+        if file_format == 'parquet':
+            df.to_parquet(f'{filename_prefix}_{suffix}.parquet', index=False)
+        else:
+            df.to_csv(f'{filename_prefix}_{suffix}.csv', index=False)
     
     # Create summary report
     system_stats = lateness_results['system_stats']
@@ -396,6 +418,6 @@ RECOMMENDED ACTIONS:
     with open(f'{filename_prefix}_summary_report.txt', 'w') as f:
         f.write(summary_report)
     
-    print(f"✅ Lateness analysis exported to {filename_prefix}_*.csv and summary report")
+    print(f"✅ Lateness analysis exported to {filename_prefix}_*.{file_format} and summary report")
     
     return True
\ No newline at end of file
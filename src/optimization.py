@@ -1,31 +1,44 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from datetime import timedelta
-from travel_analysis import analyze_agent_travel
+from travel_analysis import analyze_agent_travel, matrix_positions
 
 
-def insertion_optimization_estimate(event_log, distance_matrix, property_mapping):
+def insertion_optimization_estimate(event_log, distance_matrix, property_mapping, max_workers=1):
     """
     Estimate travel savings using a simple insertion heuristic,
     considering both escorted and virtual tours for scheduling.
     NOW INCLUDES TRIP COUNTING for before/after analysis.
+    Days are independent; with max_workers > 1 (or None for one per CPU) they
+    are optimized in a process pool, which only pays off on large event logs.
     """
-    current = analyze_agent_travel(event_log, distance_matrix)
+    current = analyze_agent_travel(event_log, distance_matrix, detailed=False)
     baseline = current['total_estimated_travel_time']
     
     # COUNT CURRENT TRAVEL TRIPS
     current_trips = count_total_travel_trips(event_log)
 
-    daily_results = []
-    total_opt = 0
-    total_opt_trips = 0
-    
-    for date, day in event_log.groupby('Date'):
-        day_res = optimize_single_day_insertion(day, distance_matrix)
-        daily_results.append(day_res)
-        total_opt += day_res['optimized_travel_time']
-        total_opt_trips += day_res['optimized_trips']
+    # Current travel and trips per day, from the per agent-day results above
+    current_daily = current['detailed_results'].groupby('date')[['daily_travel_time', 'actual_travels_required']].sum()
+
+    groups = list(event_log.groupby('Date'))
+    dates = [date for date, _ in groups]
+    days = [day for _, day in groups]
+    current_travels = current_daily.loc[dates, 'daily_travel_time'].tolist()
+    current_day_trips = current_daily.loc[dates, 'actual_travels_required'].tolist()
+    if max_workers == 1:
+        daily_results = list(map(
+            optimize_single_day_insertion, days, [distance_matrix] * len(days), current_travels, current_day_trips
+        ))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            daily_results = list(executor.map(
+                optimize_single_day_insertion, days, [distance_matrix] * len(days), current_travels, current_day_trips,
+                chunksize=max(1, len(days) // (4 * (max_workers or os.cpu_count())))
+            ))
+    total_opt = sum(day_res['optimized_travel_time'] for day_res in daily_results)
+    total_opt_trips = sum(day_res['optimized_trips'] for day_res in daily_results)
 
     savings = baseline - total_opt
     savings_pct = (savings / baseline * 100) if baseline > 0 else 0
@@ -46,132 +59,87 @@ def insertion_optimization_estimate(event_log, distance_matrix, property_mapping
     }
 
 
+def find_travel_trips(events, agent_codes=None):
+    """
+    Find every property-to-property trip in a schedule, returned as arrays of
+    origin and destination Property IDs (agents in order of first appearance,
+    each agent's trips in time order). Pass agent_codes when the caller has
+    already encoded events['Leasing Agent ID'].
+    """
+    if agent_codes is None:
+        agent_codes = pd.factorize(events['Leasing Agent ID'])[0]
+    
+    # Only escorted tours move the agent; order each agent's escorted tours by start time
+    escorted = (events['Tour Type'] == 'ESCORTED').to_numpy()
+    agent_codes = agent_codes[escorted]
+    start_times = events['Start Time'].to_numpy()[escorted]
+    property_ids = events['Property ID'].to_numpy()[escorted]
+    order = np.lexsort((start_times, agent_codes))
+    agent_codes, property_ids = agent_codes[order], property_ids[order]
+    
+    # A trip is a change of property between consecutive escorted tours of the same agent
+    trips = np.flatnonzero((agent_codes[1:] == agent_codes[:-1]) & (property_ids[1:] != property_ids[:-1]))
+    return property_ids[trips], property_ids[trips + 1]
+
+
 def count_total_travel_trips(event_log):
     """
     Count total number of property-to-property travel trips in current schedule.
     Each agent transition from one property to another = 1 trip.
     """
-    total_trips = 0
-    
-    for agent_id in event_log['Leasing Agent ID'].unique():
-        agent_tours = event_log[event_log['Leasing Agent ID'] == agent_id]
-        agent_tours = agent_tours.sort_values('Start Time')
-        
-        last_property = None
-        for _, tour in agent_tours.iterrows():
-            if tour['Tour Type'] == 'ESCORTED':
-                current_property = tour['Property ID']
-                if last_property is not None and last_property != current_property:
-                    total_trips += 1
-                last_property = current_property
-    
-    return total_trips
+    from_properties, _ = find_travel_trips(event_log)
+    return len(from_properties)
 
 
 def count_daily_travel_trips(daily_events):
     """
     Count travel trips for a single day's events.
     """
-    total_trips = 0
-    
-    for agent_id in daily_events['Leasing Agent ID'].unique():
-        agent_tours = daily_events[daily_events['Leasing Agent ID'] == agent_id]
-        agent_tours = agent_tours.sort_values('Start Time')
-        
-        last_property = None
-        for _, tour in agent_tours.iterrows():
-            if tour['Tour Type'] == 'ESCORTED':
-                current_property = tour['Property ID']
-                if last_property is not None and last_property != current_property:
-                    total_trips += 1
-                last_property = current_property
-    
-    return total_trips
+    return count_total_travel_trips(daily_events)
 
 
-def optimize_single_day_insertion(daily_events, distance_matrix):
+def optimize_single_day_insertion(daily_events, distance_matrix, current_travel=None, current_trips=None):
     """
     Simple insertion heuristic for one day. Considers both escorted and virtual tours.
     Virtual tours consume time but incur zero travel. Ensures no assignment to unavailable agent.
-    NOW INCLUDES TRIP COUNTING.
+    NOW INCLUDES TRIP COUNTING. The day's current travel and trips are computed
+    unless passed in (e.g. from analyze_agent_travel's daily results).
     """
     date = daily_events['Date'].iloc[0]
-    current_travel = calculate_daily_current_travel(daily_events, distance_matrix)
-    current_trips = count_daily_travel_trips(daily_events)
-
-    # Initialize agent states
-    agents = list(daily_events['Leasing Agent ID'].unique())
-    state = {a: {'last_end': None, 'loc': None} for a in agents}
-
-    # Sort all tours by start time
-    tours = daily_events.sort_values('Start Time')
-
-    assignments = []
-    for idx, tour in tours.iterrows():
-        best_agent = None
-        best_cost = np.inf
-        # Evaluate feasibility per agent
-        for agent in agents:
-            s = state[agent]
-            # Compute arrival
-            if tour['Tour Type'] == 'VIRTUAL_TOUR' or s['loc'] is None:
-                travel = 0
-                arrival = tour['Start Time']
-            else:
-                travel = distance_matrix.loc[s['loc'], tour['Property ID']]
-                arrival = s['last_end'] + timedelta(minutes=travel)
-            # Check availability
-            if arrival <= tour['End Time']:
-                wait = max((tour['Start Time'] - arrival).total_seconds() / 60, 0)
-                cost = travel + wait
-                if cost < best_cost:
-                    best_cost = cost
-                    best_agent = agent
-        # Determine assignment
-        if best_agent:
-            assigned = best_agent
-        else:
-            # Check original agent feasibility
-            orig = tour['Leasing Agent ID']
-            s_orig = state.get(orig, {'last_end': None, 'loc': None})
-            if tour['Tour Type'] == 'VIRTUAL_TOUR' or s_orig['loc'] is None:
-                travel_o = 0
-                arrival_o = tour['Start Time']
-            else:
-                travel_o = distance_matrix.loc[s_orig['loc'], tour['Property ID']]
-                arrival_o = s_orig['last_end'] + timedelta(minutes=travel_o)
-            if arrival_o <= tour['End Time']:
-                assigned = orig
-            else:
-                # No agent available; assign original and note
-                assigned = orig
-                print(f"WARNING {date}: No available agent for tour {idx}, assigning to original {orig}")
-        assignments.append({'tour_id': idx, 'assigned_agent': assigned})
-
-        # Update state for assigned agent
-        s = state[assigned]
-        if tour['Tour Type'] == 'VIRTUAL_TOUR':
-            start_time = max(s['last_end'] or tour['Start Time'], tour['Start Time'])
-            end_time = start_time + (tour['End Time'] - tour['Start Time'])
-            s['last_end'] = end_time
-        else:
-            if s['loc'] is None:
-                travel = 0
-                start_time = tour['Start Time']
-            else:
-                travel = distance_matrix.loc[s['loc'], tour['Property ID']]
-                start_time = max(s['last_end'] + timedelta(minutes=travel), tour['Start Time'])
-            end_time = start_time + (tour['End Time'] - tour['Start Time'])
-            s['last_end'] = end_time
-            s['loc'] = tour['Property ID']
-
-    # Build optimized events copy
+
+    # Encode the day for the array-based heuristic: tours in start order, times as
+    # int64 nanoseconds, properties as distance-matrix positions, agents as codes
+    agent_codes, agents = pd.factorize(daily_events['Leasing Agent ID'])
+    if current_travel is None or current_trips is None:
+        current_travel, current_trips = calculate_daily_travel_and_trips(daily_events, distance_matrix, agent_codes)
+    
+    start_ns = daily_events['Start Time'].to_numpy().view('i8')
+    order = np.argsort(start_ns, kind='quicksort')  # same order as sort_values
+    tour_ids = daily_events.index[order]
+    assigned, unreachable = assign_tours_by_insertion(
+        start_ns[order],
+        daily_events['End Time'].to_numpy().view('i8')[order],
+        matrix_positions(distance_matrix.index, daily_events['Property ID'].to_numpy()[order]),
+        (daily_events['Tour Type'] == 'VIRTUAL_TOUR').to_numpy()[order],
+        agent_codes[order],
+        distance_matrix.to_numpy(),
+        len(agents)
+    )
+    agents = agents.to_numpy()
+    for idx, orig in zip(tour_ids[unreachable], agents[agent_codes[order][unreachable]]):
+        print(f"WARNING {date:%Y-%m-%d}: No available agent for tour {idx}, assigning to original {orig}")
+    assigned_agents = agents[assigned]
+    assignments = [
+        {'tour_id': idx, 'assigned_agent': agent} for idx, agent in zip(tour_ids, assigned_agents)
+    ]
+
+    # Build optimized events copy, writing all assignments back in one column write
+    optimized_codes = np.empty_like(agent_codes)
+    optimized_codes[order] = assigned
     optimized = daily_events.copy()
-    for a in assignments:
-        optimized.at[a['tour_id'], 'Leasing Agent ID'] = a['assigned_agent']
+    optimized['Leasing Agent ID'] = agents[optimized_codes]
 
-    optimized_travel = calculate_daily_current_travel(optimized, distance_matrix)
-    optimized_trips = count_daily_travel_trips(optimized)
+    optimized_travel, optimized_trips = calculate_daily_travel_and_trips(optimized, distance_matrix, optimized_codes)
     
     savings = current_travel - optimized_travel
     savings_pct = (savings / current_travel * 100) if current_travel > 0 else 0
@@ -193,21 +161,80 @@ def optimize_single_day_insertion(daily_events, distance_matrix):
     }
 
 
+def minutes_to_ns(minutes):
+    """Minutes as int64 nanoseconds, rounded to whole microseconds like timedelta(minutes=...)."""
+    return (np.rint(np.asarray(minutes) * 6e7) * 1000).astype(np.int64)
+
+
+def assign_tours_by_insertion(start_ns, end_ns, property_pos, is_virtual, original_agent, travel_times, n_agents):
+    """
+    Insertion heuristic on plain arrays. Tours are in start order with times as int64
+    nanoseconds, properties as distance-matrix positions and agents as codes 0..n_agents-1.
+    Each tour goes to the reachable agent with the lowest travel + wait (first agent on
+    ties); if none can reach it, it keeps its original agent.
+    Returns the assigned agent codes and a mask of the tours no agent could reach.
+    """
+    # Travel into each property as a contiguous row, in minutes and in nanoseconds
+    travel_to = np.ascontiguousarray(travel_times.T)
+    travel_ns_to = minutes_to_ns(travel_to)
+    
+    # Agent state: when the last tour ends and where (-1 = no escorted tour yet)
+    last_end = np.full(n_agents, np.iinfo(np.int64).min)
+    loc = np.full(n_agents, -1)
+    assigned = np.empty(len(start_ns), dtype=np.int64)
+    unreachable = np.zeros(len(start_ns), dtype=bool)
+    
+    for i in range(len(start_ns)):
+        start, end, prop = start_ns[i], end_ns[i], property_pos[i]
+        
+        # Virtual tours need no travel and no wait, so every agent costs 0 and the first wins
+        if is_virtual[i]:
+            best = 0
+            if start > end:
+                best = original_agent[i]
+                unreachable[i] = True
+            assigned[i] = best
+            last_end[best] = max(last_end[best], start) + (end - start)
+            continue
+        
+        # Cost every agent at once; agents without a location yet need no travel
+        travels = loc >= 0
+        travel = np.where(travels, travel_to[prop, loc], 0.0)
+        arrival = np.where(travels, last_end + travel_ns_to[prop, loc], start)
+        feasible = arrival <= end
+        wait = np.maximum((start - arrival) / 1e9 / 60, 0)
+        cost = np.where(feasible, travel + wait, np.inf)
+        best = np.argmin(cost)
+        if not feasible[best]:
+            best = original_agent[i]
+            unreachable[i] = True
+        assigned[i] = best
+        
+        # Update state for assigned agent, reusing its arrival from the costing above
+        loc[best] = prop
+        last_end[best] = max(arrival[best], start) + (end - start)
+    
+    return assigned, unreachable
+
+
 def calculate_daily_current_travel(daily_events, distance_matrix):
     """
     Calculate total travel time for a day's events (unchanged from original).
     """
-    total = 0
-    for agent_id in daily_events['Leasing Agent ID'].unique():
-        agent_tours = daily_events[daily_events['Leasing Agent ID'] == agent_id]
-        agent_tours = agent_tours.sort_values('Start Time')
-        loc = None
-        for _, tour in agent_tours.iterrows():
-            if tour['Tour Type'] == 'ESCORTED':
-                if loc is not None and loc != tour['Property ID']:
-                    total += distance_matrix.loc[loc, tour['Property ID']]
-                loc = tour['Property ID']
-    return total
+    return calculate_daily_travel_and_trips(daily_events, distance_matrix)[0]
+
+
+def calculate_daily_travel_and_trips(daily_events, distance_matrix, agent_codes=None):
+    """
+    Total travel minutes and trip count for a day's events, from a single
+    pass over its escorted tours.
+    """
+    from_properties, to_properties = find_travel_trips(daily_events, agent_codes)
+    travel = distance_matrix.to_numpy()[
+        matrix_positions(distance_matrix.index, from_properties),
+        matrix_positions(distance_matrix.columns, to_properties)
+    ]
+    return travel.sum(), len(from_properties)
 
 
 def export_optimization_results(optimization_results, filename='optimization_results.csv'):
@@ -1,9 +1,19 @@
+import hashlib
+import json
+import os
+import pickle
 import geopy.distance
 from geopy.geocoders import Nominatim
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+# Fallback used when an address cannot be geocoded: Columbus, OH city center
+DEFAULT_COORDS = (39.9612, -82.9988)
+
+# Mean Earth radius for great-circle (haversine) distances
+EARTH_RADIUS_MILES = 3958.8
+
 def geocode_properties(property_mapping):
     """Get coordinates for all properties"""
     
@@ -22,10 +32,38 @@ def geocode_properties(property_mapping):
                 coords[row['Property ID']] = (city_location.latitude, city_location.longitude)
         except:
             # Default coordinates for Columbus, OH
-            coords[row['Property ID']] = (39.9612, -82.9988)
+            coords[row['Property ID']] = DEFAULT_COORDS
     
     return coords
 
+def load_or_geocode_properties(property_mapping, cache_path='data/cached_property_coords.json'):
+    """
+    Get coordinates for all properties, reading them from the JSON cache at
+    cache_path (keyed by Property ID) and only geocoding properties missing
+    from it. New results are written back; the Columbus fallback is not
+    cached so a failed lookup is retried on the next run.
+    """
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+    
+    missing = property_mapping[~property_mapping['Property ID'].astype(str).isin(cache)]
+    if len(missing) > 0:
+        fresh = geocode_properties(missing)
+        new_entries = {str(prop_id): list(c) for prop_id, c in fresh.items() if c != DEFAULT_COORDS}
+        if new_entries:
+            cache.update(new_entries)
+            with open(cache_path, 'w') as f:
+                json.dump(cache, f, indent=2)
+    else:
+        fresh = {}
+    
+    return {
+        prop_id: fresh[prop_id] if prop_id in fresh else tuple(cache[str(prop_id)])
+        for prop_id in property_mapping['Property ID']
+    }
+
 def calculate_travel_time(coord1, coord2, mode='driving'):
     """Calculate travel time between two coordinates"""
     
@@ -39,146 +77,197 @@ def calculate_travel_time(coord1, coord2, mode='driving'):
     
     return max(travel_time_minutes, 5)  # Minimum 5 minutes for any trip
 
-def create_distance_matrix(property_coords):
-    """Create distance matrix between all properties"""
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great-circle distance in miles between coordinates in degrees; accepts NumPy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+def matrix_positions(axis, property_ids):
+    """
+    Positions of property_ids along a distance matrix axis (its index or columns).
+    Raises KeyError listing any IDs that are not in the matrix.
+    """
+    positions = axis.get_indexer(property_ids)
+    if (positions < 0).any():
+        missing = pd.unique(np.asarray(property_ids)[positions < 0])
+        raise KeyError(f"Property IDs not in distance matrix: {missing.tolist()}")
+    return positions
+
+def create_distance_matrix(property_coords, method='geodesic'):
+    """
+    Create distance matrix between all properties.
+    
+    method='geodesic' measures each pair on the WGS-84 ellipsoid with geopy;
+    method='haversine' computes every pair at once on a sphere, which is much
+    faster but shifts travel times slightly (up to 0.2% on the current properties).
+    """
     
     property_ids = list(property_coords.keys())
     n = len(property_ids)
     
-    distance_matrix = pd.DataFrame(
-        index=property_ids,
-        columns=property_ids,
-        dtype=float
-    )
+    if method == 'haversine':
+        # Same driving model as calculate_travel_time, applied to the whole matrix
+        lat, lon = np.array([property_coords[prop_id] for prop_id in property_ids], dtype=float).reshape(n, 2).T
+        distance_miles = haversine_miles(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        travel_times = np.maximum((distance_miles / 25) * 60 + 2, 5)
+        np.fill_diagonal(travel_times, 0)
+        return pd.DataFrame(travel_times, index=property_ids, columns=property_ids)
     
-    for i, prop1 in enumerate(property_ids):
-        for j, prop2 in enumerate(property_ids):
-            if i == j:
-                distance_matrix.loc[prop1, prop2] = 0
-            else:
-                travel_time = calculate_travel_time(
-                    property_coords[prop1],
-                    property_coords[prop2]
-                )
-                distance_matrix.loc[prop1, prop2] = travel_time
+    # Travel time is symmetric, so compute each pair once, mirror it, and wrap
+    # the filled array in a DataFrame at the end
+    travel_times = np.zeros((n, n))
+    for i, j in zip(*np.triu_indices(n, k=1)):
+        travel_times[i, j] = travel_times[j, i] = calculate_travel_time(
+            property_coords[property_ids[i]],
+            property_coords[property_ids[j]]
+        )
     
+    return pd.DataFrame(travel_times, index=property_ids, columns=property_ids)
+
+def load_or_create_distance_matrix(property_coords, cache_path='data/cached_distance_matrix.pkl', method='geodesic'):
+    """
+    Get the distance matrix for property_coords, reusing the one pickled at
+    cache_path when it was built by the same method from exactly the same
+    coordinates (in the same order); otherwise build it and replace the cached copy.
+    """
+    key = hashlib.blake2b(repr((method, list(property_coords.items()))).encode(), digest_size=16).hexdigest()
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cached_key, distance_matrix = pickle.load(f)
+        if cached_key == key:
+            return distance_matrix
+    
+    distance_matrix = create_distance_matrix(property_coords, method=method)
+    with open(cache_path, 'wb') as f:
+        pickle.dump((key, distance_matrix), f, protocol=pickle.HIGHEST_PROTOCOL)
     return distance_matrix
 
-def analyze_agent_travel(event_log, distance_matrix):
-    """Analyze travel patterns for all agents"""
-    results = []
-    total_system_travel_time = 0
-
-    # Group by agent and date
-    for (agent_id, date), group in event_log.groupby(['Leasing Agent ID', 'Date']):
-
-        #Sort tours by start time
-        daily_tours = group.sort_values('Start Time').reset_index(drop=True)
-        daily_travel_time = 0
-        travel_segments = []
-
-        current_physical_location = None
-
-        for i in range(len(daily_tours)):
-            tour  = daily_tours.iloc[i]
-
-            if tour['Tour Type'] == 'ESCORTED':
-                #Agent needs to be physically present for escorted tours
-
-                if current_physical_location is not None and current_physical_location != tour['Property ID']:
-                    # Agent needs to travel from last escorted location to this one
-                    travel_time = distance_matrix.loc[current_physical_location, tour['Property ID']]
-                    daily_travel_time += travel_time
-                    total_system_travel_time += travel_time
-
-                    travel_segments.append({
-                        'from_property': current_physical_location,
-                        'to_property': tour['Property ID'],
-                        'travel_time': travel_time,
-                        'tour_causing_travel': i,  # Which tour required this travel
-                        'prev_end': daily_tours.iloc[i-1]['End Time'] if i > 0 else None,
-                        'next_start': tour['Start Time'],
-                        'buffer_time': (tour['Start Time'] - daily_tours.iloc[i-1]['End Time']).total_seconds() / 60 if i > 0 else None
-                    })
-
-                # Update agent's physical location
-                current_physical_location = tour['Property ID']
-            
-        results.append({
-        'agent_id': agent_id,
-        'date': date,
-        'total_tours': len(daily_tours),
-        'escorted_tours': len(daily_tours[daily_tours['Tour Type'] == 'ESCORTED']),
-        'virtual_tours': len(daily_tours[daily_tours['Tour Type'] == 'VIRTUAL_TOUR']),
-        'actual_travels_required': len(travel_segments),
-        'daily_travel_time': daily_travel_time,
-        'travel_segments': travel_segments,
-        'final_physical_location': current_physical_location
-        })
+def analyze_agent_travel(event_log, distance_matrix, detailed=True):
+    """
+    Analyze travel patterns for all agents, one row per agent per day.
+
+    An agent travels between consecutive escorted tours of the same day at
+    different properties. Set detailed=False to skip building the per-day
+    travel_segments lists when only the totals are needed.
+    """
+    # Sort once by agent, date and start time so each agent-day is a contiguous run in tour order
+    event_log = event_log.sort_values(['Leasing Agent ID', 'Date', 'Start Time'], kind='mergesort')
+    agent_ids = event_log['Leasing Agent ID'].to_numpy()
+    dates = event_log['Date'].to_numpy()
+    property_ids = event_log['Property ID'].to_numpy()
+    escorted = (event_log['Tour Type'] == 'ESCORTED').to_numpy()
+    virtual = (event_log['Tour Type'] == 'VIRTUAL_TOUR').to_numpy()
+
+    # Number the agent-day groups in (agent, date) order
+    new_group = np.ones(len(event_log), dtype=bool)
+    new_group[1:] = (agent_ids[1:] != agent_ids[:-1]) | (dates[1:] != dates[:-1])
+    group_codes = np.cumsum(new_group) - 1
+    group_starts = np.flatnonzero(new_group)
+    n_groups = len(group_starts)
+
+    # Travel happens between consecutive escorted tours of a group at different properties
+    escorted_rows = np.flatnonzero(escorted)
+    same_group = group_codes[escorted_rows[1:]] == group_codes[escorted_rows[:-1]]
+    moves = same_group & (property_ids[escorted_rows[1:]] != property_ids[escorted_rows[:-1]])
+    from_rows, to_rows = escorted_rows[:-1][moves], escorted_rows[1:][moves]
+    travel = distance_matrix.to_numpy()[
+        matrix_positions(distance_matrix.index, property_ids[from_rows]),
+        matrix_positions(distance_matrix.columns, property_ids[to_rows])
+    ]
+    segment_groups = group_codes[to_rows]
+    travels_required = np.bincount(segment_groups, minlength=n_groups)
+
+    # Where each agent ends the day: its last escorted property (NaN if it had none)
+    final_location = np.full(n_groups, np.nan)
+    last_escorted = np.ones(len(escorted_rows), dtype=bool)
+    last_escorted[:-1] = ~same_group
+    final_location[group_codes[escorted_rows[last_escorted]]] = property_ids[escorted_rows[last_escorted]]
+
+    detailed_results = pd.DataFrame({
+        'agent_id': agent_ids[group_starts],
+        'date': dates[group_starts],
+        'total_tours': np.bincount(group_codes, minlength=n_groups),
+        'escorted_tours': np.bincount(group_codes[escorted], minlength=n_groups),
+        'virtual_tours': np.bincount(group_codes[virtual], minlength=n_groups),
+        'actual_travels_required': travels_required,
+        'daily_travel_time': np.bincount(segment_groups, weights=travel, minlength=n_groups),
+        'travel_segments': build_travel_segments(event_log, from_rows, to_rows, travel, group_starts[segment_groups],
+                                                 travels_required) if detailed else None,
+        'final_physical_location': final_location
+    })
+    total_system_travel_time = travel.sum()
     return {
-        'detailed_results': pd.DataFrame(results),
+        'detailed_results': detailed_results,
         'total_estimated_travel_time': total_system_travel_time,
         'summary_stats': {
             'total_minutes': total_system_travel_time,
             'total_hours': total_system_travel_time / 60,
-            'total_actual_travels': sum(len(r['travel_segments']) for r in results)
+            'total_actual_travels': len(travel)
         }
     }
 
+def build_travel_segments(sorted_events, from_rows, to_rows, travel, group_start_rows, travels_per_group):
+    """
+    Per agent-day lists of travel segment dicts for analyze_agent_travel.
+    Rows are positions into the sorted event log; the tour before a trip is
+    the previous row of the same agent-day, escorted or not.
+    """
+    property_ids = sorted_events['Property ID'].to_numpy()
+    start_times = sorted_events['Start Time']
+    end_times = sorted_events['End Time']
+    buffers = (start_times.to_numpy()[to_rows] - end_times.to_numpy()[to_rows - 1]).astype('int64') / 1e9 / 60
+    segments = [
+        {
+            'from_property': from_property,
+            'to_property': to_property,
+            'travel_time': travel_time,
+            'tour_causing_travel': tour,  # Which tour required this travel
+            'prev_end': prev_end,
+            'next_start': next_start,
+            'buffer_time': buffer_time
+        }
+        for from_property, to_property, travel_time, tour, prev_end, next_start, buffer_time in zip(
+            property_ids[from_rows], property_ids[to_rows], travel, (to_rows - group_start_rows).tolist(),
+            end_times.iloc[to_rows - 1], start_times.iloc[to_rows], buffers.tolist()
+        )
+    ]
+    bounds = np.cumsum(travels_per_group).tolist()
+    return [segments[begin:stop] for begin, stop in zip([0] + bounds[:-1], bounds)]
+
+def safe_divide(values, counts):
+    """Element-wise values / counts, with 0 wherever the count is 0"""
+    return np.divide(values, counts, out=np.zeros(len(counts)), where=counts > 0)
+
 def calculate_agent_shift_metrics(travel_results, agent_mapping):
     """Calculate average travel time per agent per shift and other agent-level metrics"""
     
     detailed_results = travel_results['detailed_results']
     
-    # Calculate per-agent metrics
-    agent_metrics = []
-    
-    for agent_id in detailed_results['agent_id'].unique():
-        agent_data = detailed_results[detailed_results['agent_id'] == agent_id]
-        
-        # Get agent name
-        agent_name = "Unknown"
-        if agent_id in agent_mapping['Agent ID'].values:
-            agent_name = agent_mapping[agent_mapping['Agent ID'] == agent_id]['Agent Name'].iloc[0]
-        
-        # Calculate metrics for this agent
-        total_shifts = len(agent_data)
-        total_travel_time = agent_data['daily_travel_time'].sum()
-        avg_travel_per_shift = total_travel_time / total_shifts if total_shifts > 0 else 0
-        
-        # Calculate other useful metrics
-        total_tours = agent_data['total_tours'].sum()
-        total_escorted_tours = agent_data['escorted_tours'].sum()
-        total_virtual_tours = agent_data['virtual_tours'].sum()
-        total_travels = agent_data['actual_travels_required'].sum()
-        
-        avg_tours_per_shift = total_tours / total_shifts if total_shifts > 0 else 0
-        avg_escorted_per_shift = total_escorted_tours / total_shifts if total_shifts > 0 else 0
-        avg_travels_per_shift = total_travels / total_shifts if total_shifts > 0 else 0
-        
-        # Travel efficiency metrics
-        travel_time_per_tour = total_travel_time / total_tours if total_tours > 0 else 0
-        travel_time_per_escorted_tour = total_travel_time / total_escorted_tours if total_escorted_tours > 0 else 0
-        
-        agent_metrics.append({
-            'agent_id': agent_id,
-            'agent_name': agent_name,
-            'total_shifts': total_shifts,
-            'total_travel_time_minutes': total_travel_time,
-            'avg_travel_time_per_shift_minutes': avg_travel_per_shift,
-            'total_tours': total_tours,
-            'total_escorted_tours': total_escorted_tours,
-            'total_virtual_tours': total_virtual_tours,
-            'total_actual_travels': total_travels,
-            'avg_tours_per_shift': avg_tours_per_shift,
-            'avg_escorted_tours_per_shift': avg_escorted_per_shift,
-            'avg_travels_per_shift': avg_travels_per_shift,
-            'travel_time_per_tour_minutes': travel_time_per_tour,
-            'travel_time_per_escorted_tour_minutes': travel_time_per_escorted_tour,
-            'travel_efficiency_score': (total_tours / (total_travel_time + 1)) * 100  # Tours per minute * 100
-        })
-    
-    agent_metrics_df = pd.DataFrame(agent_metrics)
+    # Calculate per-agent totals in one groupby
+    agent_metrics_df = detailed_results.groupby('agent_id', sort=False).agg(
+        total_shifts=('date', 'size'),
+        total_travel_time_minutes=('daily_travel_time', 'sum'),
+        total_tours=('total_tours', 'sum'),
+        total_escorted_tours=('escorted_tours', 'sum'),
+        total_virtual_tours=('virtual_tours', 'sum'),
+        total_actual_travels=('actual_travels_required', 'sum')
+    ).reset_index()
+    agent_name_map = dict(zip(agent_mapping['Agent ID'], agent_mapping['Agent Name']))
+    agent_metrics_df.insert(1, 'agent_name', [agent_name_map.get(agent_id, "Unknown") for agent_id in agent_metrics_df['agent_id']])
+    
+    # Per-shift averages and travel efficiency metrics (0 when there is nothing to divide by)
+    shifts = agent_metrics_df['total_shifts'].to_numpy()
+    travel_time = agent_metrics_df['total_travel_time_minutes'].to_numpy()
+    tours = agent_metrics_df['total_tours'].to_numpy()
+    escorted = agent_metrics_df['total_escorted_tours'].to_numpy()
+    agent_metrics_df.insert(4, 'avg_travel_time_per_shift_minutes', safe_divide(travel_time, shifts))
+    agent_metrics_df['avg_tours_per_shift'] = safe_divide(tours, shifts)
+    agent_metrics_df['avg_escorted_tours_per_shift'] = safe_divide(escorted, shifts)
+    agent_metrics_df['avg_travels_per_shift'] = safe_divide(agent_metrics_df['total_actual_travels'].to_numpy(), shifts)
+    agent_metrics_df['travel_time_per_tour_minutes'] = safe_divide(travel_time, tours)
+    agent_metrics_df['travel_time_per_escorted_tour_minutes'] = safe_divide(travel_time, escorted)
+    agent_metrics_df['travel_efficiency_score'] = (tours / (travel_time + 1)) * 100  # Tours per minute * 100
     
     # Calculate system-wide averages
     system_metrics = {